@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi.responses import RedirectResponse
 from typing import List
 import os
 import sys
+import asyncio
 from datetime import datetime
 import time
 
@@ -9,17 +11,19 @@ import time
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 # Import existing functionality
-from data_pipeline.data_loader import load_data
-from hyperparameter_tuner.tuner import optimize_hyperparameters
-from model_trainer.trainer import train_final_model
-from model_ops.model_manager import save_model_package, load_model_package, get_company_models
-from model_ops.model_predictor import predict_future
+# (training runs in separate worker processes: predictions are served from
+#  NumPy bundles and the API process never loads TensorFlow)
+from model_ops.model_predictor import predict_future, predict_ensemble, fetch_latest_prices, ensemble_window
 from model_ops.model_manager import get_company_models, delete_models, get_all_companies_with_models
+from model_ops.model_registry import get_model_package, get_ensemble
+from model_ops.forecast_table import lookup_forecast
+from serving.workloads import get_training_queue, get_inference_pool, workload_status, TrainingQueueFull
+from serving.sharding import get_membership, get_shard_mode, forward_request, redirect_url, was_forwarded
 
 # Import Pydantic models
 from .models import (
     TrainRequest, TrainResponse, PredictRequest, PredictResponse,
-    CompanyModelsResponse, DeleteResponse, HealthResponse
+    CompanyModelsResponse, DeleteResponse, HealthResponse, StatusResponse
 )
 
 router = APIRouter()
@@ -29,121 +33,20 @@ async def train_model(request: TrainRequest):
     """
     Train a new model and return predictions immediately
     """
-    print("API: Starting COMPLETE TRAINING PIPELINE")
-    print("=" * 50)
-    print(f"Company: {request.company}")
-    print(f"Lookback: {request.lookback_period}")
-    print(f"Trials: {request.n_trials}")
-    print(f"Predict Days: {request.days_ahead}")
-    print("=" * 50)
-    
-    start_time = time.time()
-    
+    # Runs in a training worker process pinned to the training cores
+    # (serving/workloads.py); this process never imports TensorFlow
     try:
-        # 1. DATA LOADING
-        print("\nPHASE 1: Loading Data...")
-        data_load_start = time.time()
-        data = load_data(request.company, request.lookback_period)
-        data_load_time = time.time() - data_load_start
-        
-        print(f"Loaded {len(data)} data points for {request.company}")
-        print(f"Date range: {data.index[0].strftime('%Y-%m-%d')} to {data.index[-1].strftime('%Y-%m-%d')}")
-        print(f"Price range: ${data.min():.2f} - ${data.max():.2f}")
-        print(f"Data loading time: {data_load_time:.2f}s")
-        
-        # 2. HYPERPARAMETER OPTIMIZATION
-        print("\nPHASE 2: Hyperparameter Optimization...")
-        tuning_start = time.time()
-        best_hyperparams = optimize_hyperparameters(data, n_trials=request.n_trials)
-        tuning_time = time.time() - tuning_start
-        
-        print(f"Best hyperparameters found:")
-        for param, value in best_hyperparams.items():
-            print(f"   - {param}: {value}")
-        print(f"Tuning time: {tuning_time:.2f}s")
-        
-        # 3. FINAL MODEL TRAINING
-        print("\nPHASE 3: Final Model Training...")
-        training_start = time.time()
-        model, history, scaler = train_final_model(data, best_hyperparams)
-        training_time = time.time() - training_start
-        
-        final_train_loss = history['loss'][-1] if history['loss'] else 'N/A'
-        final_val_loss = history['val_loss'][-1] if history['val_loss'] else 'N/A'
-        
-        print(f"Model trained successfully")
-        print(f"Final training loss: {final_train_loss:.4f}")
-        print(f"Final validation loss: {final_val_loss:.4f}")
-        print(f"Training time: {training_time:.2f}s")
-        
-        # 4. MODEL SAVING
-        print("\nPHASE 4: Saving Model Package...")
-        saving_start = time.time()
-        save_paths = save_model_package(
-            model=model, 
-            scaler=scaler, 
-            best_params=best_hyperparams, 
-            training_history=history, 
-            company=request.company, 
-            lookback_period=request.lookback_period
-        )
-        saving_time = time.time() - saving_start
-        
-        print(f"Model package saved:")
-        for key, path in save_paths.items():
-            print(f"   - {key}: {os.path.basename(path)}")
-        print(f"Saving time: {saving_time:.2f}s")
-        
-        # 5. VERIFICATION LOAD
-        print("\nPHASE 5: Verifying Saved Model...")
-        verify_start = time.time()
-        loaded_package = load_model_package(request.company)
-        verify_time = time.time() - verify_start
-        
-        print(f"Model loaded successfully for verification")
-        print(f"Metadata: {loaded_package['metadata']['company']} trained on {loaded_package['metadata']['training_date']}")
-        print(f"Verification time: {verify_time:.2f}s")
-        
-        # 6. GENERATE PREDICTIONS
-        print("\nPHASE 6: Generating Predictions...")
-        predict_start = time.time()
-        
-        predictions = predict_future(
-            model_package=loaded_package,
-            days_ahead=request.days_ahead
-        )
-        
-        predict_time = time.time() - predict_start
-        
-        print(f"Generated {len(predictions)} predictions")
-        print(f"Prediction range: ${predictions.min():.2f} - ${predictions.max():.2f}")
-        print(f"Prediction time: {predict_time:.2f}s")
-        
-        # 7. FINAL SUMMARY
-        total_time = time.time() - start_time
-        print("\nAPI TRAINING PIPELINE COMPLETED SUCCESSFULLY!")
-        print("=" * 50)
-        print(f"Total pipeline time: {total_time:.2f}s")
-        print(f"Data points processed: {len(data)}")
-        print(f"Hyperparameters optimized: {len(best_hyperparams)}")
-        print(f"Predictions generated: {len(predictions)} days")
-        print(f"Model saved to: {save_paths['model_path']}")
-        print("=" * 50)
-        
-        # Format the response
-        return TrainResponse(
-            company=request.company,
-            lookback_period=request.lookback_period,
-            training_date=loaded_package['metadata']['training_date'],
-            training_time_seconds=total_time,
-            hyperparameters=best_hyperparams,
-            performance={
-                'final_train_loss': final_train_loss,
-                'final_val_loss': final_val_loss
-            },
-            predictions=predictions.tolist() if hasattr(predictions, 'tolist') else predictions,
+        job = get_training_queue().submit(
+            "model_trainer.pipeline:run_training_pipeline", **request.model_dump()
         )
-        
+    except TrainingQueueFull as e:
+        print(f"API: training queue full, rejecting {request.company}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    
+    print(f"API: queued training job for {request.company}")
+    try:
+        result = await asyncio.wrap_future(job)
+        return TrainResponse(**result)
     except Exception as e:
         print(f"\nAPI TRAINING PIPELINE FAILED: {str(e)}")
         import traceback
@@ -151,22 +54,95 @@ async def train_model(request: TrainRequest):
         raise HTTPException(status_code=500, detail=f"Training failed: {str(e)}")
 
 @router.post("/predict", response_model=PredictResponse)
-async def get_predictions(request: PredictRequest):
+async def get_predictions(request: PredictRequest, http_request: Request):
     """
     Get predictions from an existing trained model
     
     - Uses the latest model for the company
+    - With ensemble, averages every retained version and reports their spread
+    - In sharded mode, live inference runs on the node owning the company
     """
     print("API: Starting prediction pipeline")
     print("=" * 40)
     print(f"Company: {request.company}")
     print(f"Days ahead: {request.days_ahead}")
+    print(f"Ensemble: {request.ensemble}")
     print("=" * 40)
     
+    # Post-close forecasts are materialized by model_ops/forecast_table.py (latest version only)
+    forecast = None
+    if not request.ensemble:
+        try:
+            forecast = lookup_forecast(request.company, request.days_ahead)
+        except Exception as e:
+            print(f"Forecast table unavailable, using live inference: {str(e)}")
+    membership = get_membership()
+    node_url = membership.node_url if membership else None
+    if forecast is not None:
+        print("Served from the forecast table")
+        return PredictResponse(
+            company=request.company,
+            predictions=forecast.tolist(),
+            generated_at=datetime.now(),
+            source="forecast_table",
+            served_by=node_url
+        )
+    
+    # Sharded serving (serving/sharding.py): only the owner loads the company's model;
+    # a request another node already routed is served here, even if the rings disagree
+    if membership and not was_forwarded(http_request):
+        owner_url = membership.owner_url(request.company)
+        if owner_url != node_url:
+            target = f"{owner_url}/api/predict"
+            if get_shard_mode() == 'redirect':
+                print(f"Redirecting {request.company} to its shard {owner_url}")
+                return RedirectResponse(redirect_url(target), status_code=307)
+            print(f"Forwarding {request.company} to its shard {owner_url}")
+            try:
+                status_code, body = await asyncio.to_thread(
+                    forward_request, target, request.model_dump(), membership.forward_timeout
+                )
+            except OSError as e:
+                # Storage is shared, so this node can still serve the request itself
+                print(f"Shard {owner_url} unreachable, serving locally: {str(e)}")
+            else:
+                if status_code != 200:
+                    raise HTTPException(status_code=status_code, detail=body.get('detail', body))
+                return PredictResponse(**body)
+    
     try:
-        # Load the model package
+        inference = get_inference_pool()
+        if request.ensemble:
+            # All retained versions, rolled out together (about the cost of one model)
+            print("\nLoading model versions...")
+            # Versions are padded and stacked once per storage generation
+            model_packages, stacks = await inference.run(get_ensemble, request.company)
+            print(f"Ensemble of {len(model_packages)} versions")
+            predict_start = time.time()
+            # Network I/O stays off the pinned inference threads
+            latest_prices = await asyncio.to_thread(
+                fetch_latest_prices, model_packages[0]['metadata']['company'], ensemble_window(model_packages)
+            )
+            predictions, spread = await inference.run(
+                predict_ensemble,
+                model_packages=model_packages,
+                days_ahead=request.days_ahead,
+                latest_prices=latest_prices,
+                stacks=stacks
+            )
+            print(f"Prediction time: {time.time() - predict_start:.2f}s")
+            return PredictResponse(
+                company=request.company,
+                predictions=predictions.tolist(),
+                generated_at=datetime.now(),
+                served_by=node_url,
+                spread=spread.tolist(),
+                ensemble_size=len(model_packages)
+            )
+        
+        # Load the model package (cached until a new version is published)
         print("\nLoading model package...")
-        model_package = load_model_package(request.company)
+        model_package = await inference.run(get_model_package, request.company)
         
         print(f"Model loaded: {model_package['metadata']['company']}")
         print(f"Trained on: {model_package['metadata']['training_date']}")
@@ -176,9 +152,15 @@ async def get_predictions(request: PredictRequest):
         print(f"\nGenerating {request.days_ahead} predictions...")
         predict_start = time.time()
         
-        predictions = predict_future(
+        # Fetch prices outside the inference pool: it only has a thread per inference core
+        latest_prices = await asyncio.to_thread(
+            fetch_latest_prices, model_package['metadata']['company'], model_package['metadata']['slicing_window']
+        )
+        predictions = await inference.run(
+            predict_future,
             model_package=model_package,
-            days_ahead=request.days_ahead
+            days_ahead=request.days_ahead,
+            latest_prices=latest_prices
         )
         
         predict_time = time.time() - predict_start
@@ -191,7 +173,8 @@ async def get_predictions(request: PredictRequest):
         return PredictResponse(
             company=request.company,
             predictions=predictions.tolist() if hasattr(predictions, 'tolist') else predictions,
-            generated_at=datetime.now()
+            generated_at=datetime.now(),
+            served_by=node_url
         )
         
     except FileNotFoundError:
@@ -260,4 +243,16 @@ async def health_check():
     return HealthResponse(
         status="healthy",
         timestamp=datetime.now()
-    )
\ No newline at end of file
+    )
+
+@router.get("/status", response_model=StatusResponse)
+async def workload_status_check():
+    """Training queue depth and wait times, inference load, core budgets and shard membership"""
+    status = workload_status()
+    membership = get_membership()
+    return StatusResponse(
+        training=status['training'],
+        inference=status['inference'],
+        sharding=membership.status() if membership else None,
+        timestamp=datetime.now()
+    )
@@ -1,32 +1,55 @@
+import re
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 from datetime import datetime
+from runtime_profile.profiles import RUNTIME_PROFILES
+
+# Longest accepted lookback per unit (about 252 trading days a year)
+LOOKBACK_LIMITS = {'d': 2520, 'mo': 120, 'y': 10}
 
 class TrainRequest(BaseModel):
     """Request model for training with immediate prediction"""
     company: str = Field(..., description="Stock ticker symbol (e.g., MSFT, AAPL)")
-    lookback_period: str = Field("50mo", description="Lookback period for training data in months (e.g., '12mo', '24mo')")
+    lookback_period: str = Field("50mo", description="Lookback period for training data: trading days, months or years (e.g., '500d', '24mo', '3y')")
     n_trials: int = Field(20, ge=1, le=50, description="Number of hyperparameter optimization trials (1-50)")
     days_ahead: int = Field(10, ge=1, le=30, description="Number of days to predict after training (1-30)")
+    runtime_profile: Optional[str] = Field(None, description="Runtime performance profile for this job (default: deployment profile)")
+    final_training: Literal["budget", "warm_start"] = Field("budget", description="Final training strategy: 'budget' retrains for the tuned epoch count, 'warm_start' fine-tunes the best trial's weights")
+    search_mode: Literal["hyperband", "multi_fidelity", "multi_objective"] = Field("hyperband", description="Tuning strategy: 'hyperband' trains every trial on all data, 'multi_fidelity' screens trials on recent data and promotes the best, 'multi_objective' trades loss against inference latency and size")
+    selection: Optional[str] = Field(None, description="With multi_objective, how to pick from the Pareto front: 'min_loss', 'fastest_within:0.02' (default) or 'smallest_within:0.02'")
     
     @field_validator('lookback_period')
     @classmethod
     def validate_lookback_period(cls, v: str) -> str:
-        """Validate that lookback_period ends with 'mo' and has reasonable value"""
-        if not v.endswith('mo'):
-            raise ValueError('lookback_period must end with "mo" (e.g., "12mo", "24mo")')
+        """Validate that lookback_period is 'Nd', 'Nmo' or 'Ny' and at most 10 years"""
+        match = re.fullmatch(r'(\d+)(d|mo|y)', v)
+        if not match:
+            raise ValueError('lookback_period must be a number followed by "d", "mo" or "y" (e.g., "500d", "12mo", "2y")')
         
-        try:
-            months = int(v.replace('mo', ''))
-            if months < 1:
-                raise ValueError('Lookback period must be at least 1 month')
-            if months > 120:  # 10 years max
-                raise ValueError('Lookback period cannot exceed 120 months (10 years)')
-        except ValueError:
-            raise ValueError('lookback_period must be a number followed by "mo" (e.g., "12mo")')
+        amount, unit = int(match.group(1)), match.group(2)
+        if amount < 1:
+            raise ValueError('Lookback period must be at least 1')
+        if amount > LOOKBACK_LIMITS[unit]:  # 10 years max
+            raise ValueError(f'Lookback period cannot exceed {LOOKBACK_LIMITS[unit]}{unit} (10 years)')
             
         return v
 
+    @field_validator('selection')
+    @classmethod
+    def validate_selection(cls, v: Optional[str]) -> Optional[str]:
+        """Validate that selection is 'min_loss' or '<fastest|smallest>_within:<relative tolerance>'"""
+        if v is not None and not re.fullmatch(r'min_loss|(fastest|smallest)_within:\d+(\.\d+)?', v):
+            raise ValueError('selection must be "min_loss", "fastest_within:<tolerance>" or "smallest_within:<tolerance>"')
+        return v
+
+    @field_validator('runtime_profile')
+    @classmethod
+    def validate_runtime_profile(cls, v: Optional[str]) -> Optional[str]:
+        """Validate that runtime_profile names a known profile"""
+        if v is not None and v not in RUNTIME_PROFILES:
+            raise ValueError(f'runtime_profile must be one of {sorted(RUNTIME_PROFILES)}')
+        return v
+
 class TrainResponse(BaseModel):
     """Response model for train + predict operation"""
     company: str
@@ -36,17 +59,24 @@ class TrainResponse(BaseModel):
     hyperparameters: Dict[str, Any]
     performance: Dict[str, float]
     predictions: List[float]
+    tuning_report: Optional[Dict[str, Any]] = None
+    quantization: Optional[Dict[str, Any]] = None
 
 class PredictRequest(BaseModel):
     """Request model for predictions only"""
     company: str = Field(..., description="Stock ticker symbol")
     days_ahead: int = Field(10, ge=1, le=30, description="Number of days to predict (1-30)")
+    ensemble: bool = Field(False, description="Average the forecasts of every retained model version (see MODEL_KEEP_VERSIONS)")
 
 class PredictResponse(BaseModel):
     """Response model for predictions"""
     company: str
     predictions: List[float]
     generated_at: datetime
+    source: Literal["live", "forecast_table"] = "live"
+    served_by: Optional[str] = None
+    spread: Optional[List[float]] = None
+    ensemble_size: Optional[int] = None
 
 class CompanyModelsResponse(BaseModel):
     """Response model for listing company models"""
@@ -63,4 +93,11 @@ class DeleteResponse(BaseModel):
 class HealthResponse(BaseModel):
     """Health check response"""
     status: str
-    timestamp: datetime
\ No newline at end of file
+    timestamp: datetime
+
+class StatusResponse(BaseModel):
+    """Workload status: training queue and inference pool"""
+    training: Dict[str, Any]
+    inference: Dict[str, Any]
+    sharding: Optional[Dict[str, Any]] = None
+    timestamp: datetime
@@ -1,15 +1,47 @@
+import os
+from datetime import timedelta
 import yfinance as yf
-import pandas as pd  
+import pandas as pd
+from data_pipeline.offline_provider import load_offline_data
+from data_pipeline.trading_calendar import period_to_range, window_for_bars
 
-def load_data(company, lookback_period):
+def load_data(company, lookback_period=None, start=None, end=None):
     """
     Fetch the historical price data for a given company over a specified lookback window.
+
+    The lookback period ('60d' trading days, '12mo', '2y') is resolved to an exact
+    date range with the trading calendar; alternatively pass start/end dates
+    (both inclusive). DATA_PROVIDER=offline serves deterministic synthetic prices
+    instead of Yahoo Finance.
     """
     try:
+        if lookback_period is not None:
+            start, end = period_to_range(lookback_period)
+        if os.environ.get('DATA_PROVIDER', 'yfinance') == 'offline':
+            return load_offline_data(company, start, end)
         ticker = yf.Ticker(company)
-        data = ticker.history(period=lookback_period)
+        # yfinance treats end as exclusive
+        data = ticker.history(start=start, end=end + timedelta(days=1))
         data = data['Close']
         return data
     except Exception as e:
         raise e
-    
\ No newline at end of file
+
+def load_recent_bars(company, n_bars, end=None):
+    """
+    Fetch exactly the last n_bars daily closes, ending at the last completed session
+
+    Raises:
+        ValueError: If the provider has fewer bars than the trading calendar expects
+    """
+    start, end = window_for_bars(n_bars, end)
+    data = load_data(company, start=start, end=end)
+    missing = n_bars - len(data)
+    if missing > 0:
+        # The ticker did not trade on some sessions (halts, recent listing): look further back once
+        start, end = window_for_bars(n_bars + missing, end)
+        data = load_data(company, start=start, end=end)
+    if len(data) < n_bars:
+        raise ValueError(f"Only {len(data)} of {n_bars} trading days available for {company} "
+                         f"up to {end.isoformat()}")
+    return data[-n_bars:]
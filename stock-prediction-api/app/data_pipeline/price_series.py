@@ -0,0 +1,139 @@
+"""
+Out-of-core price series for training.
+
+load_price_series fetches a lookback range from the price provider in chunks
+of STREAMING_CHUNK_SESSIONS sessions and appends each chunk's closes as
+float32 to a scratch file, which is then memory-mapped read-only. The full
+series never exists as a float64 pandas frame: only one chunk is in memory
+at a time, and training reads pages of the map as it needs them.
+
+Scaler statistics are accumulated with StandardScaler.partial_fit over
+fixed-size chunks (in float64, so they match a one-shot fit), and scaled
+copies of the series are written chunk by chunk into float32 maps next to
+the raw one.
+
+Environment:
+    STREAMING_CHUNK_SESSIONS  sessions fetched per provider request (default 2520,
+                              so a daily lookback of up to 10 years is one request)
+    STREAMING_DIR             scratch directory for the memory-mapped series (default: system temp)
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from data_pipeline.data_loader import load_data
+from data_pipeline.trading_calendar import period_to_range, trading_days
+
+DEFAULT_CHUNK_SESSIONS = 2520
+# Values scaled (or partial-fitted) per step: 4 MB of float32
+SCALE_CHUNK = 1 << 20
+
+
+def get_chunk_sessions():
+    return int(os.environ.get('STREAMING_CHUNK_SESSIONS', DEFAULT_CHUNK_SESSIONS))
+
+
+def iter_price_chunks(company, start, end, chunk_sessions=None):
+    """Closes between start and end (both inclusive) as consecutive provider chunks (pandas Series)"""
+    chunk_sessions = chunk_sessions or get_chunk_sessions()
+    sessions = trading_days(start, end)
+    for offset in range(0, len(sessions), chunk_sessions):
+        block = sessions[offset:offset + chunk_sessions]
+        chunk = load_data(company, start=block[0].date(), end=block[-1].date())
+        if len(chunk):
+            yield chunk
+
+
+def partial_fit_scaler(values, chunk_size=SCALE_CHUNK):
+    """StandardScaler fitted incrementally over a 1-D array (or memmap)"""
+    scaler = StandardScaler()
+    for offset in range(0, len(values), chunk_size):
+        scaler.partial_fit(np.asarray(values[offset:offset + chunk_size], dtype=np.float64).reshape(-1, 1))
+    return scaler
+
+
+def scale_into(scaler, values, out, chunk_size=SCALE_CHUNK):
+    """Write scaler.transform(values) into the float32 array out, chunk by chunk"""
+    for offset in range(0, len(values), chunk_size):
+        chunk = np.asarray(values[offset:offset + chunk_size], dtype=np.float64).reshape(-1, 1)
+        out[offset:offset + len(chunk)] = scaler.transform(chunk).reshape(-1)
+    return out
+
+
+def allocate_series(length, directory=None):
+    """Writable float32 array for a scaled series: memory-mapped in directory, else in memory"""
+    if directory is None:
+        return np.empty(length, dtype=np.float32)
+    fd, path = tempfile.mkstemp(suffix=".f32", dir=directory)
+    os.close(fd)
+    # np.memmap cannot map an empty file
+    return np.memmap(path, dtype=np.float32, mode='w+', shape=(max(length, 1),))[:length]
+
+
+class PriceSeries:
+    """Daily closes stored as a read-only float32 memmap in a scratch directory"""
+
+    def __init__(self, directory, length, start, end, low, high):
+        self.directory = directory
+        self.path = os.path.join(directory, "closes.f32")
+        self.start = start
+        self.end = end
+        self.min = low
+        self.max = high
+        self.values = np.memmap(self.path, dtype=np.float32, mode='r', shape=(length,))
+
+    @classmethod
+    def from_chunks(cls, chunks, directory=None):
+        """
+        Append price chunks (pandas Series or arrays) to a new memory-mapped series
+
+        Raises:
+            ValueError: If the chunks hold no prices
+        """
+        directory = tempfile.mkdtemp(prefix="prices_", dir=directory or os.environ.get('STREAMING_DIR'))
+        length, start, end, low, high = 0, None, None, np.inf, -np.inf
+        try:
+            with open(os.path.join(directory, "closes.f32"), 'wb') as f:
+                for chunk in chunks:
+                    values = np.asarray(getattr(chunk, 'values', chunk), dtype=np.float32).reshape(-1)
+                    if not len(values):
+                        continue
+                    values.tofile(f)
+                    length += len(values)
+                    low, high = min(low, float(values.min())), max(high, float(values.max()))
+                    if hasattr(chunk, 'index'):
+                        start = start or chunk.index[0].date()
+                        end = chunk.index[-1].date()
+            if not length:
+                raise ValueError("No prices to build a series from")
+        except BaseException:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        return cls(directory, length, start, end, low, high)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Delete the scratch directory (raw and scaled maps); views already handed out stay valid on POSIX"""
+        self.values = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def load_price_series(company, lookback_period=None, start=None, end=None, chunk_sessions=None):
+    """
+    Stream a company's closes into a PriceSeries (see load_data for the range arguments)
+
+    Raises:
+        ValueError: If the provider returns no prices for the range
+    """
+    if lookback_period is not None:
+        start, end = period_to_range(lookback_period)
+    return PriceSeries.from_chunks(iter_price_chunks(company, start, end, chunk_sessions))
@@ -0,0 +1,177 @@
+"""
+NYSE/Nasdaq trading calendar.
+
+Turns "the last N daily bars" or a lookback period into an exact, minimal
+date range, so price fetches never depend on calendar-day guesses. Holidays
+come from the exchange rules (with weekend observance) plus an offline table
+of one-off closures; nothing is looked up over the network.
+"""
+import functools
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+import pandas as pd
+
+EXCHANGE_TIMEZONE = ZoneInfo("America/New_York")
+# Regular close; on early-close days (13:00) the bar is simply picked up later
+SESSION_CLOSE = time(16, 0)
+
+# Unscheduled full-day closures (national days of mourning, weather, 9/11)
+SPECIAL_CLOSURES = frozenset({
+    date(2001, 9, 11), date(2001, 9, 12), date(2001, 9, 13), date(2001, 9, 14),
+    date(2004, 6, 11),
+    date(2007, 1, 2),
+    date(2012, 10, 29), date(2012, 10, 30),
+    date(2018, 12, 5),
+    date(2025, 1, 9),
+})
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+def _easter(year):
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year, month, weekday, n):
+    """n-th given weekday of a month (n=-1 for the last one)"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day):
+    """Saturday holidays are observed on Friday, Sunday holidays on Monday"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@functools.lru_cache(maxsize=64)
+def exchange_holidays(year):
+    """Full-day exchange holidays of a calendar year"""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),          # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),          # Washington's Birthday
+        _easter(year) - timedelta(days=2),    # Good Friday
+        _nth_weekday(year, 5, 0, -1),         # Memorial Day
+        _observed(date(year, 7, 4)),          # Independence Day
+        _nth_weekday(year, 9, 0, 1),          # Labor Day
+        _nth_weekday(year, 11, 3, 4),         # Thanksgiving
+        _observed(date(year, 12, 25)),        # Christmas
+    }
+    # New Year's Day on a Saturday is not moved back into the previous year
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(holidays | {d for d in SPECIAL_CLOSURES if d.year == year})
+
+
+def is_trading_day(day):
+    day = _to_date(day)
+    return day.weekday() < 5 and day not in exchange_holidays(day.year)
+
+
+def previous_trading_day(day):
+    """Last session strictly before day"""
+    day = _to_date(day) - timedelta(days=1)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return day
+
+
+def next_trading_day(day):
+    """First session strictly after day"""
+    day = _to_date(day) + timedelta(days=1)
+    while not is_trading_day(day):
+        day += timedelta(days=1)
+    return day
+
+
+def trading_days(start, end):
+    """Sessions between start and end (both inclusive) as a DatetimeIndex"""
+    days = pd.bdate_range(_to_date(start), _to_date(end))
+    return days[[is_trading_day(d) for d in days]]
+
+
+def last_completed_session(now=None):
+    """Most recent session whose daily bar is final (today only after the close)"""
+    now = now.astimezone(EXCHANGE_TIMEZONE) if now else datetime.now(EXCHANGE_TIMEZONE)
+    today = now.date()
+    if is_trading_day(today) and now.time() >= SESSION_CLOSE:
+        return today
+    return previous_trading_day(today)
+
+
+def next_session_close(now=None):
+    """Time (exchange timezone) when the next daily bar becomes final"""
+    now = now.astimezone(EXCHANGE_TIMEZONE) if now else datetime.now(EXCHANGE_TIMEZONE)
+    today = now.date()
+    if not (is_trading_day(today) and now.time() < SESSION_CLOSE):
+        today = next_trading_day(today)
+    return datetime.combine(today, SESSION_CLOSE, tzinfo=EXCHANGE_TIMEZONE)
+
+
+def window_for_bars(n_bars, end=None):
+    """
+    Exact date range holding the last n_bars sessions
+
+    Args:
+        n_bars: Number of daily bars needed
+        end: Last session to include (default: last completed session)
+
+    Returns:
+        Tuple (start, end) of dates, both inclusive
+    """
+    if n_bars < 1:
+        raise ValueError(f"n_bars must be positive, got {n_bars}")
+    end = _to_date(end) if end is not None else last_completed_session()
+    if not is_trading_day(end):
+        end = previous_trading_day(end)
+    start = end
+    for _ in range(n_bars - 1):
+        start = previous_trading_day(start)
+    return start, end
+
+
+def period_to_range(lookback_period, end=None):
+    """
+    Date range for a lookback period: 'Nd' is N trading days, 'Nmo' and 'Ny' are calendar months/years
+
+    Returns:
+        Tuple (start, end) of dates, both inclusive
+    """
+    if lookback_period.endswith('d'):
+        return window_for_bars(int(lookback_period[:-1]), end)
+
+    end = _to_date(end) if end is not None else last_completed_session()
+    if lookback_period.endswith('mo'):
+        offset = pd.DateOffset(months=int(lookback_period[:-2]))
+    elif lookback_period.endswith('y'):
+        offset = pd.DateOffset(years=int(lookback_period[:-1]))
+    else:
+        raise ValueError(f"Unsupported lookback period: {lookback_period}")
+    start = (pd.Timestamp(end) - offset).date() + timedelta(days=1)
+    return start, end
@@ -0,0 +1,155 @@
+"""
+Tuning-session data context shared by every Optuna trial.
+
+Only slicing_window changes the training data between trials, so the series
+is split and scaled once per session and the windowed train/val datasets are
+cached per distinct slicing_window. Windows are float32 views built with
+sliding_window_view, not copies.
+
+For process-parallel tuning the scaled series lives in one SharedMemory block:
+workers attach to it by name and build their windows as views into it, so no
+worker copies or rescales the data.
+
+A PriceSeries (data_pipeline/price_series.py) is scaled out of core: the
+scaler is partial-fitted over chunks of the train part and the scaled series
+is written to a float32 memmap in the series' scratch directory, which
+process workers map by path instead of copying it into shared memory.
+"""
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+from numpy.lib.stride_tricks import sliding_window_view
+from data_pipeline.price_series import PriceSeries, partial_fit_scaler, scale_into, allocate_series
+from model_ops.model_bundle import scaler_state, scaler_from_state
+
+# Temporal split used by every tuning trial
+TRAIN_SPLIT = 0.8
+
+
+def make_windows(series, slicing_window):
+    """(X, y) for next-step prediction: X[i] = series[i:i+w], y[i] = series[i+w]"""
+    if len(series) <= slicing_window:
+        return (np.empty((0, slicing_window, 1), dtype=series.dtype),
+                np.empty((0,), dtype=series.dtype))
+    X = sliding_window_view(series[:-1], slicing_window)[..., np.newaxis]
+    y = series[slicing_window:]
+    return X, y
+
+
+class TuningDataContext:
+    """Split, scaled float32 series plus a per-slicing_window cache of windows"""
+
+    def __init__(self, scaled_train, scaled_val, scaler=None, shm=None, owner=False, path=None):
+        self.scaled_train = scaled_train
+        self.scaled_val = scaled_val
+        self.scaler = scaler
+        self.path = path
+        self._shm = shm
+        self._owner = owner
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_series(cls, data, train_split=TRAIN_SPLIT, scratch_dir=None):
+        """
+        Split and scale a price series once (scaler fitted on the train part only)
+
+        Args:
+            data: PriceSeries, pandas Series or 1-D array of prices
+            train_split: Fraction of the series used for training
+            scratch_dir: Directory for a memory-mapped scaled series (default: the
+                PriceSeries' own directory; other inputs are scaled in memory)
+        """
+        if isinstance(data, PriceSeries):
+            scratch_dir = scratch_dir or data.directory
+            data = data.values
+        dataset = np.asarray(getattr(data, 'values', data)).reshape(-1)
+        split_idx = int(len(dataset) * train_split)
+
+        scaler = partial_fit_scaler(dataset[:split_idx])
+        scaled = scale_into(scaler, dataset, allocate_series(len(dataset), scratch_dir))
+        path = scaled.filename if isinstance(scaled, np.memmap) else None
+        return cls(scaled[:split_idx], scaled[split_idx:], scaler, path=path)
+
+    def __len__(self):
+        return len(self.scaled_train) + len(self.scaled_val)
+
+    def windows(self, slicing_window):
+        """
+        Cached windowed datasets for one slicing_window
+
+        Returns:
+            Tuple (X_train, y_train, X_val, y_val); X shaped (samples, slicing_window, 1).
+            Arrays are read-only views of the scaled series.
+        """
+        with self._lock:
+            cached = self._windows.get(slicing_window)
+            if cached is None:
+                X_train, y_train = make_windows(self.scaled_train, slicing_window)
+                X_val, y_val = make_windows(self.scaled_val, slicing_window)
+                cached = (X_train, y_train, X_val, y_val)
+                self._windows[slicing_window] = cached
+            return cached
+
+    def share(self):
+        """
+        Copy the scaled series into shared memory for worker processes
+
+        Returns:
+            Picklable descriptor for TuningDataContext.attach()
+        """
+        # Workers record the statistics with their checkpoints (warm starts reuse them)
+        scaler = scaler_state(self.scaler) if self.scaler is not None else None
+        if self.path is not None:
+            # Already a file on disk: workers map it read-only
+            return {
+                'path': self.path,
+                'train_len': len(self.scaled_train),
+                'val_len': len(self.scaled_val),
+                'scaler': scaler,
+            }
+        if self._shm is None:
+            series = np.concatenate([self.scaled_train, self.scaled_val])
+            shm = shared_memory.SharedMemory(create=True, size=max(series.nbytes, 1))
+            shared = np.ndarray(series.shape, dtype=np.float32, buffer=shm.buf)
+            shared[:] = series
+            train_len = len(self.scaled_train)
+            shared.flags.writeable = False
+            self.scaled_train, self.scaled_val = shared[:train_len], shared[train_len:]
+            self._shm, self._owner = shm, True
+            self._windows.clear()
+        return {
+            'name': self._shm.name,
+            'train_len': len(self.scaled_train),
+            'val_len': len(self.scaled_val),
+            'scaler': scaler,
+        }
+
+    @classmethod
+    def attach(cls, descriptor):
+        """Open a context shared by another process (no copy)"""
+        total = descriptor['train_len'] + descriptor['val_len']
+        scaler = scaler_from_state(descriptor['scaler']) if descriptor.get('scaler') else None
+        if 'path' in descriptor:
+            mapped = np.memmap(descriptor['path'], dtype=np.float32, mode='r', shape=(max(total, 1),))[:total]
+            return cls(mapped[:descriptor['train_len']], mapped[descriptor['train_len']:], scaler,
+                       path=descriptor['path'])
+        shm = shared_memory.SharedMemory(name=descriptor['name'])
+        shared = np.ndarray((total,), dtype=np.float32, buffer=shm.buf)
+        shared.flags.writeable = False
+        return cls(shared[:descriptor['train_len']], shared[descriptor['train_len']:], scaler, shm=shm)
+
+    def close(self):
+        """Release the shared block (unlinked by the process that created it)"""
+        if self._shm is None:
+            return
+        self._windows.clear()
+        self.scaled_train = self.scaled_val = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # A caller still holds a window view; the mapping goes away with the process
+            pass
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
@@ -0,0 +1,72 @@
+"""
+Process memory accounting for tuning trials.
+
+RssSampler polls the resident set size on a background thread while a trial
+trains, so each trial can record its own peak. estimate_trial_memory_mb
+projects what a configuration will need before it is built, so trials that
+would exceed TUNING_MEMORY_LIMIT_MB can be rejected up front.
+"""
+import os
+import sys
+import threading
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+# Weights, gradients and the two Adam moments, all float32
+_BYTES_PER_PARAM = 4 * 4
+# LSTM activations kept for backprop per timestep and unit (4 gates, cell, hidden, float32)
+_BYTES_PER_LSTM_ACTIVATION = 6 * 4
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 2 ** 20
+    except OSError:
+        import resource
+        # Lifetime peak, the best available without /proc (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def get_memory_limit_mb():
+    """TUNING_MEMORY_LIMIT_MB, or None when tuning memory is not capped"""
+    value = os.environ.get('TUNING_MEMORY_LIMIT_MB')
+    return float(value) if value else None
+
+
+def estimate_trial_memory_mb(n_params, slicing_window, units, batch_size, recurrent_layers=2):
+    """Rough extra memory a trial needs on top of the current process (MB)"""
+    activations = batch_size * slicing_window * units * recurrent_layers * _BYTES_PER_LSTM_ACTIVATION
+    return (n_params * _BYTES_PER_PARAM + activations) / 2 ** 20
+
+
+class RssSampler:
+    """Context manager tracking the peak RSS while its block runs"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.start_mb = None
+        self.peak_mb = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+    def __enter__(self):
+        self.start_mb = self.peak_mb = current_rss_mb()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+        return False
+
+    @property
+    def delta_mb(self):
+        return self.peak_mb - self.start_mb
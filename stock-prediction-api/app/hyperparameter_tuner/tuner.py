@@ -1,85 +1,677 @@
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
-os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+from runtime_profile.profiles import get_runtime_profile, apply_environment, configure_tensorflow
+# oneDNN is read once when TensorFlow is imported, so use the deployment profile here
+apply_environment(get_runtime_profile())
 import optuna
 from tensorflow import keras
 import numpy as np
-from sklearn.preprocessing import StandardScaler
+import gc
+import json
+import math
+import h5py
+import time
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import warnings
+from hyperparameter_tuner.data_context import TuningDataContext
+from hyperparameter_tuner.window_feed import fit_inputs
+from data_pipeline.price_series import PriceSeries
+from hyperparameter_tuner.resource_monitor import (
+    RssSampler, current_rss_mb, estimate_trial_memory_mb, get_memory_limit_mb
+)
+from model_ops.model_bundle import BundleModel, extract_layers, scaler_state, scaler_from_state
 
+# Upper bound on epochs for both tuning trials (with early stopping) and final training
+MAX_EPOCHS = 80
+# Final training holds out this fraction of windows for validation_split
+FINAL_VALIDATION_SPLIT = 0.1
+# Multi-fidelity search: (fraction of the most recent data, max epochs) per rung
+MULTI_FIDELITY_RUNGS = [(1 / 9, 10), (1 / 3, 27), (1.0, MAX_EPOCHS)]
+# Only the best 1/PROMOTION_RATE configurations of a rung move to the next one
+PROMOTION_RATE = 3
+# A rung trains on at least this many windows' worth of data per configuration
+RUNG_MIN_WINDOWS = 10
+# Headroom applied to estimate_trial_memory_mb when checking TUNING_MEMORY_LIMIT_MB
+MEMORY_SAFETY_FACTOR = 2.0
+# Multi-objective search: objectives (all minimized) and the default Pareto-front selection rule
+OBJECTIVES = ['val_loss', 'inference_ms', 'params']
+DEFAULT_SELECTION = "fastest_within:0.02"
+# Forward passes timed per trial for inference_ms (the fastest one counts)
+LATENCY_REPEATS = 30
+# With parallel='process', a worker process is replaced after this many trials
+# (TensorFlow keeps some per-fit state that clear_session does not free)
+TRIALS_PER_PROCESS = 10
+# .h5 attribute holding the tuning scaler of a trial checkpoint (warm starts scale with it)
+CHECKPOINT_SCALER_ATTR = "tuning_scaler"
 
-def optimize_hyperparameters(data, n_trials=5):
-    """Find best hyperparameters using Bayesian optimization with early pruning"""
+# Trials currently training in this process (Keras state is cleared when it drops to 0)
+_active_trials = 0
+_active_trials_lock = threading.Lock()
+
+
+def optimize_hyperparameters(data, n_trials=5, profile=None, checkpoint_path=None, n_jobs=None,
+                             parallel=None, search_mode=None, search_report=None, selection=None):
+    """
+    Find best hyperparameters using Bayesian optimization with early pruning
+
+    The returned 'epochs' is the best trial's converged epoch count, scaled to
+    the number of windows final training sees (same number of gradient steps).
+    If checkpoint_path (an .h5 file) is given, the best trial's weights are
+    saved there so train_final_model can warm-start from them.
+
+    The series is scaled once and windows are cached per slicing_window
+    (TuningDataContext). With n_jobs > 1, trials run in threads sharing that
+    context, or with parallel='process' in spawned worker processes that read
+    the scaled series from shared memory and are replaced every
+    TUNING_TRIALS_PER_PROCESS trials (parallel='process' also applies with
+    n_jobs=1, to bound memory on long studies). Defaults come from the
+    TUNING_N_JOBS and TUNING_PARALLEL environment variables. A PriceSeries
+    (data_pipeline/price_series.py) is scaled into a memmap instead, which
+    process workers map from disk, and windows beyond STREAMING_WINDOW_BUDGET_MB
+    are fed to Keras batch by batch (hyperparameter_tuner/window_feed.py).
+    
+    search_mode='multi_fidelity' (default: TUNING_SEARCH_MODE or 'hyperband')
+    runs successive halving instead: all n_trials configurations train on the
+    most recent slice of the series with few epochs, and only the best third
+    of each rung is promoted to more data and epochs (MULTI_FIDELITY_RUNGS).
+    Rungs run in threads only (parallel='process' does not apply). If a
+    search_report dict is given, it is filled with trials and compute per rung.
+    
+    search_mode='multi_objective' minimizes validation loss, NumPy inference
+    latency per forecast step and parameter count together (in threads, without
+    pruning) and picks one model of the Pareto front with selection (default:
+    TUNING_SELECTION or 'fastest_within:0.02', see select_from_front). The
+    search_report then also holds the front.
+    """
+    if profile is None:
+        profile = get_runtime_profile()
+    configure_tensorflow(profile)
+    n_jobs = n_jobs or int(os.environ.get('TUNING_N_JOBS', 1))
+    parallel = parallel or os.environ.get('TUNING_PARALLEL', 'thread')
+    search_mode = search_mode or os.environ.get('TUNING_SEARCH_MODE', 'hyperband')
+    
+    if search_mode == 'multi_fidelity':
+        if parallel == 'process':
+            print("Multi-fidelity search runs its rungs in threads; TUNING_PARALLEL=process is ignored")
+        study, total_length = _successive_halving(data, n_trials, profile, checkpoint_path, n_jobs,
+                                                  search_report)
+        return _final_params(study, total_length)
+    if search_mode == 'multi_objective':
+        selection = selection or os.environ.get('TUNING_SELECTION', DEFAULT_SELECTION)
+        study, total_length, selected = _multi_objective(data, n_trials, profile, checkpoint_path, n_jobs,
+                                                         selection, search_report)
+        return _final_params(study, total_length, selected)
+    if search_mode != 'hyperband':
+        raise ValueError(f"Unknown search mode: {search_mode}")
+    
+    owns_context = not isinstance(data, TuningDataContext)
+    context = TuningDataContext.from_series(data) if owns_context else data
+    objective = _Objective(context, profile, checkpoint_path)
+    callbacks = [_drop_worse_checkpoints] if checkpoint_path else None
+    
+    tuning_start = time.time()
+    total_length = len(context)
+    try:
+        if parallel == 'process':
+            study = _optimize_in_processes(context, n_trials, n_jobs, profile, checkpoint_path)
+        else:
+            # Optimize with pruning
+            study = optuna.create_study(direction='minimize', 
+                                       pruner=optuna.pruners.HyperbandPruner())
+            study.optimize(objective, n_trials=n_trials, n_jobs=n_jobs, callbacks=callbacks)
+    finally:
+        # Unlinks the shared memory block even when a worker or trial raised
+        if owns_context:
+            context.close()
+    # Picked once all trials are done, so concurrent trials cannot overwrite the winner
+    if checkpoint_path:
+        _promote_best_checkpoint(checkpoint_path, study)
+    
+    if search_report is not None:
+        rung = _rung_summary(study.trials, 1.0, MAX_EPOCHS, time.time() - tuning_start)
+        search_report.update({'mode': 'hyperband', 'rungs': [rung],
+                              'total_sample_epochs': rung['sample_epochs']})
+    
+    return _final_params(study, total_length)
+
+def _final_params(study, total_length, trial=None):
+    """Parameters of trial (default: the best one) with the epoch count scaled to final training"""
+    trial = trial or _best_completed_trial(study)
+    if trial is None:
+        raise ValueError(_no_completed_trials_message(study.trials))
+    best_params = dict(trial.params)
+    best_params['epochs'] = MAX_EPOCHS
+    
+    best_epoch = trial.user_attrs.get('best_epoch')
+    if best_epoch is not None:
+        # Final training sees more windows per epoch; keep the gradient step count
+        final_samples = (total_length - best_params['slicing_window']) * (1 - FINAL_VALIDATION_SPLIT)
+        trial_samples = trial.user_attrs['train_samples']
+        scaled_epochs = math.ceil(best_epoch * trial_samples / final_samples)
+        best_params['tuned_epoch'] = best_epoch
+        best_params['epochs'] = min(MAX_EPOCHS, max(1, scaled_epochs))
+    
+    return best_params
+
+def _no_completed_trials_message(trials):
+    """Why a study has no COMPLETE trial, naming the memory limit when it pruned them"""
+    memory_pruned = [t for t in trials if t.user_attrs.get('memory_pruned')]
+    if not memory_pruned:
+        states = [t.state.name.lower() for t in trials]
+        counts = ", ".join(f"{states.count(state)} {state}" for state in sorted(set(states)))
+        return f"No tuning trial completed ({counts or 'no trials'})"
+    # Projected before training, or the RSS reached when the ceiling stopped it
+    rss = [t.user_attrs.get('projected_rss_mb', t.user_attrs.get('peak_rss_mb')) for t in memory_pruned]
+    rss = [value for value in rss if value is not None]
+    smallest = f"; the smallest projected RSS was {min(rss):.0f} MB" if rss else ""
+    return (f"No tuning trial completed: {len(memory_pruned)} of {len(trials)} exceeded the "
+            f"{get_memory_limit_mb():.0f} MB tuning memory limit (TUNING_MEMORY_LIMIT_MB){smallest}")
+
+class _Objective:
+    """Optuna objective over a shared TuningDataContext (picklable for worker processes)"""
     
-    def objective(trial):
-        # Suggest hyperparameters
-        params = {
-            'slicing_window': trial.suggest_int('slicing_window', 20, 60),
-            'LSTM_units': trial.suggest_categorical('LSTM_units', [32, 48, 64, 96, 128]),
-            'dropout_rate': trial.suggest_float('dropout_rate', 0.1, 0.4),
-            'epochs': 80  # Fixed high value for early stopping
-        }
+    def __init__(self, context, profile, checkpoint_path=None):
+        self.context = context
+        self.profile = profile
+        self.checkpoint_path = checkpoint_path
+    
+    def __call__(self, trial):
+        params = _suggest_params(trial)
         # REJECT trials where slicing_window is too large
-        if params['slicing_window'] > len(data) * 0.2:  # Max 20% of data
+        if params['slicing_window'] > len(self.context) * 0.2:  # Max 20% of data
             return float('inf')
         # Evaluate with multi-fidelity (early stopping)
-        score = evaluate_with_early_stopping(data, params, trial)
+        score = evaluate_with_early_stopping(self.context, params, trial, self.profile, self.checkpoint_path)
         return score
+
+class _MultiObjective(_Objective):
+    """Objective returning (validation loss, inference ms per forecast step, parameter count)"""
     
-    # Optimize with pruning
-    study = optuna.create_study(direction='minimize', 
-                               pruner=optuna.pruners.HyperbandPruner())
-    study.optimize(objective, n_trials=n_trials)
+    INFEASIBLE = (float('inf'), float('inf'), float('inf'))
     
-    best_params = study.best_params
-    best_params['epochs'] = 80 
+    def __call__(self, trial):
+        params = _suggest_params(trial, architecture=True)
+        if params['slicing_window'] > len(self.context) * 0.2:
+            return self.INFEASIBLE
+        loss = evaluate_with_early_stopping(self.context, params, trial, self.profile, self.checkpoint_path,
+                                            measure_latency=True)
+        if not math.isfinite(loss):
+            return self.INFEASIBLE
+        return loss, trial.user_attrs['inference_ms'], trial.user_attrs['params']
+
+def _suggest_params(trial, architecture=False):
+    """
+    Search space shared by every search mode
+
+    With architecture (multi-objective mode only), the cell type ('LSTM_units'
+    then sizes GRU layers too) and the number of recurrent layers are searched
+    as well; otherwise models keep two LSTM layers.
+    """
+    params = {
+        'slicing_window': trial.suggest_int('slicing_window', 20, 60),
+        'LSTM_units': trial.suggest_categorical('LSTM_units', [32, 48, 64, 96, 128]),
+        'dropout_rate': trial.suggest_float('dropout_rate', 0.1, 0.4),
+        'epochs': MAX_EPOCHS  # Fixed high value for early stopping
+    }
+    if architecture:
+        params['cell'] = trial.suggest_categorical('cell', ['lstm', 'gru'])
+        params['recurrent_layers'] = trial.suggest_int('recurrent_layers', 1, 2)
+    return params
+
+class _RungObjective:
+    """Objective for one successive-halving rung: recent data_fraction of the series, capped epochs"""
     
-    return best_params
+    def __init__(self, dataset, data_fraction, max_epochs, profile, checkpoint_path=None, scratch_dir=None):
+        self.dataset = dataset
+        self.scratch_dir = scratch_dir
+        self.data_fraction = data_fraction
+        self.max_epochs = max_epochs
+        self.profile = profile
+        self.checkpoint_path = checkpoint_path
+        # One context (scaled once, windows cached) per distinct subsample length
+        self.contexts = {}
+    
+    def context_for(self, slicing_window):
+        total = len(self.dataset)
+        length = min(total, max(int(total * self.data_fraction), RUNG_MIN_WINDOWS * slicing_window))
+        if length not in self.contexts:
+            self.contexts[length] = TuningDataContext.from_series(self.dataset[-length:],
+                                                                  scratch_dir=self.scratch_dir)
+        return self.contexts[length]
+    
+    def __call__(self, trial):
+        params = _suggest_params(trial)
+        # Window limit is relative to the full series, so rungs agree on what is feasible
+        if params['slicing_window'] > len(self.dataset) * 0.2:
+            return float('inf')
+        context = self.context_for(params['slicing_window'])
+        trial.set_user_attr('data_points', len(context))
+        return evaluate_with_early_stopping(context, params, trial, self.profile, self.checkpoint_path,
+                                            max_epochs=self.max_epochs)
 
-def evaluate_with_early_stopping(data, params, trial):
-    """Train model with early stopping and report intermediate values"""
+def _successive_halving(data, n_trials, profile, checkpoint_path, n_jobs, search_report):
+    """
+    Multi-fidelity search over MULTI_FIDELITY_RUNGS
     
-    # Prepare data (temporal split)
-    dataset = data.values
-    split_idx = int(len(dataset) * 0.8)
-    train_data = dataset[:split_idx]
-    val_data = dataset[split_idx:]
+    Returns:
+        Tuple (study of the full-data rung, length of the series)
+    """
+    # A PriceSeries stays memory-mapped; rung subsets are scaled into its scratch directory
+    scratch_dir = data.directory if isinstance(data, PriceSeries) else None
+    dataset = np.asarray(getattr(data, 'values', data)).reshape(-1)
+    rungs = []
+    candidates = None
     
-    # Scale data
-    scaler = StandardScaler()
-    scaled_train = scaler.fit_transform(train_data.reshape(-1, 1))
-    scaled_val = scaler.transform(val_data.reshape(-1, 1))
+    for rung_index, (data_fraction, max_epochs) in enumerate(MULTI_FIDELITY_RUNGS):
+        last_rung = rung_index == len(MULTI_FIDELITY_RUNGS) - 1
+        # Only full-data trials are worth warm-starting final training from
+        rung_checkpoint = checkpoint_path if last_rung else None
+        objective = _RungObjective(dataset, data_fraction, max_epochs, profile, rung_checkpoint, scratch_dir)
+        # Promotion replaces the pruner. Only the first rung samples (TPE); later
+        # rungs replay the promoted configurations enqueued below
+        study = optuna.create_study(direction='minimize', sampler=optuna.samplers.TPESampler(),
+                                    pruner=optuna.pruners.NopPruner())
+        if candidates is None:
+            rung_trials = n_trials
+        else:
+            for params in candidates:
+                study.enqueue_trial(params)
+            rung_trials = len(candidates)
+        
+        callbacks = [_drop_worse_checkpoints] if rung_checkpoint else None
+        print(f"Rung {rung_index}: {rung_trials} trials on {data_fraction:.0%} of the data, "
+              f"up to {max_epochs} epochs")
+        rung_start = time.time()
+        study.optimize(objective, n_trials=rung_trials, n_jobs=n_jobs, callbacks=callbacks)
+        rungs.append(_rung_summary(study.trials, data_fraction, max_epochs, time.time() - rung_start))
+        
+        finished = sorted((t for t in study.trials
+                           if t.state == optuna.trial.TrialState.COMPLETE and math.isfinite(t.value)),
+                          key=lambda t: t.value)
+        if not finished:
+            raise ValueError("No feasible hyperparameters: every trial was rejected")
+        if last_rung:
+            if rung_checkpoint:
+                _promote_best_checkpoint(rung_checkpoint, study)
+            break
+        keep = max(1, math.ceil(len(finished) / PROMOTION_RATE))
+        candidates = [dict(t.params) for t in finished[:keep]]
     
-    # Create sequences
-    X_train, y_train = create_sequences(scaled_train, params['slicing_window'])
-    X_val, y_val = create_sequences(scaled_val, params['slicing_window'])
+    if search_report is not None:
+        total = sum(rung['sample_epochs'] for rung in rungs)
+        # What the same number of configurations would cost at full fidelity
+        full_per_trial = rungs[-1]['sample_epochs'] / max(1, rungs[-1]['n_trials'])
+        search_report.update({
+            'mode': 'multi_fidelity',
+            'rungs': rungs,
+            'total_sample_epochs': total,
+            'full_fidelity_estimate': int(full_per_trial * n_trials),
+        })
     
-    # Build model
-    model = build_model(params, X_train.shape[1])
+    return study, len(dataset)
+
+def _multi_objective(data, n_trials, profile, checkpoint_path, n_jobs, selection, search_report):
+    """
+    Multi-objective search over OBJECTIVES
     
-    # Early stopping callback
-    early_stopping = keras.callbacks.EarlyStopping(
-        monitor='val_loss', patience=5, restore_best_weights=True
-    )
+    Returns:
+        Tuple (study, length of the series, trial picked from the Pareto front)
+    """
+    owns_context = not isinstance(data, TuningDataContext)
+    context = TuningDataContext.from_series(data) if owns_context else data
+    # TPE handles several objectives and, unlike NSGA-II, learns within a 20-50 trial budget
+    study = optuna.create_study(directions=['minimize'] * len(OBJECTIVES),
+                                sampler=optuna.samplers.TPESampler())
+    callbacks = [_drop_dominated_checkpoints] if checkpoint_path else None
     
-    # Train with intermediate reporting
-    history = model.fit(
-        X_train, y_train,
-        epochs=80, #params['epochs']
-        batch_size=32,
-        validation_data=(X_val, y_val),
-        callbacks=[early_stopping],
-        verbose=0
-    )
+    tuning_start = time.time()
+    try:
+        study.optimize(_MultiObjective(context, profile, checkpoint_path), n_trials=n_trials, n_jobs=n_jobs,
+                       callbacks=callbacks)
+    finally:
+        if owns_context:
+            context.close()
+    
+    front = sorted((t for t in study.best_trials if all(math.isfinite(v) for v in t.values)),
+                   key=lambda t: t.values)
+    if not front:
+        raise ValueError("No feasible hyperparameters: every trial was rejected")
+    selected = select_from_front(front, selection)
+    print(f"Pareto front of {len(front)} trials; {selection} picked trial {selected.number} "
+          f"(loss {selected.values[0]:.4f}, {selected.values[1]:.3f} ms, {int(selected.values[2])} params)")
     
-    # Report intermediate values for pruning
-    for epoch, (train_loss, val_loss) in enumerate(zip(history.history['loss'], 
-                                                       history.history['val_loss'])):
-        trial.report(val_loss, epoch)
-        if trial.should_prune():
-            raise optuna.TrialPruned()
+    if checkpoint_path:
+        for trial in front:
+            trial_checkpoint = trial.user_attrs.get('checkpoint')
+            if trial_checkpoint and os.path.exists(trial_checkpoint):
+                if trial.number == selected.number:
+                    os.replace(trial_checkpoint, checkpoint_path)
+                else:
+                    os.remove(trial_checkpoint)
+        if not os.path.exists(checkpoint_path):
+            raise FileNotFoundError(f"Checkpoint of selected trial {selected.number} is missing: "
+                                    f"{selected.user_attrs.get('checkpoint')}")
     
-    return min(history.history['val_loss'])
+    if search_report is not None:
+        rung = _rung_summary(study.trials, 1.0, MAX_EPOCHS, time.time() - tuning_start)
+        search_report.update({
+            'mode': 'multi_objective',
+            'rungs': [rung],
+            'total_sample_epochs': rung['sample_epochs'],
+            'objectives': OBJECTIVES,
+            'selection': selection,
+            'selected_trial': selected.number,
+            'pareto_front': [
+                {'trial': t.number, 'params': t.params, 'val_loss': t.values[0],
+                 'inference_ms': t.values[1], 'params_count': int(t.values[2])}
+                for t in front
+            ],
+        })
+    
+    return study, len(context), selected
+
+def select_from_front(front, selection):
+    """
+    Pick one trial of a Pareto front
+    
+    Args:
+        front: Trials with values ordered as OBJECTIVES
+        selection: 'min_loss', 'fastest_within:<rel>' or 'smallest_within:<rel>'; the
+            *_within rules take the fastest (fewest parameters) trial whose loss is at
+            most (1 + rel) times the best loss, e.g. 'fastest_within:0.02'
+    """
+    rule, _, tolerance = selection.partition(':')
+    if rule == 'min_loss':
+        return min(front, key=lambda t: t.values)
+    if rule not in ('fastest_within', 'smallest_within'):
+        raise ValueError(f"Unknown selection rule: {selection}")
+    best_loss = min(t.values[0] for t in front)
+    eligible = [t for t in front if t.values[0] <= best_loss * (1 + float(tolerance or 0))]
+    objective = OBJECTIVES.index('inference_ms' if rule == 'fastest_within' else 'params')
+    return min(eligible, key=lambda t: (t.values[objective], t.values[0]))
+
+def _rung_summary(trials, data_fraction, max_epochs, seconds):
+    """Trials and compute of one rung (sample_epochs = training windows x epochs run)"""
+    states = [t.state for t in trials]
+    return {
+        'data_fraction': round(data_fraction, 4),
+        'max_epochs': max_epochs,
+        'n_trials': len(trials),
+        'completed': states.count(optuna.trial.TrialState.COMPLETE),
+        'pruned': states.count(optuna.trial.TrialState.PRUNED),
+        'sample_epochs': int(sum(t.user_attrs.get('train_samples', 0) * t.user_attrs.get('epochs_run', 0)
+                                 for t in trials)),
+        'memory_pruned': sum(1 for t in trials if t.user_attrs.get('memory_pruned')),
+        'peak_rss_mb': max((t.user_attrs['peak_rss_mb'] for t in trials if 'peak_rss_mb' in t.user_attrs),
+                           default=None),
+        'seconds': round(seconds, 2),
+    }
+
+def _best_completed_trial(study):
+    """Best COMPLETE trial of a single-objective study, or None"""
+    completed = study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))
+    return min(completed, key=lambda t: t.value) if completed else None
+
+def _drop_worse_checkpoints(study, trial):
+    """
+    Study callback: delete the weights of finished trials that are not the best
+
+    A finished trial that is not the best can never become it, so this is safe
+    from any thread or worker process; _promote_best_checkpoint picks the
+    winner once all trials are done.
+    """
+    best = _best_completed_trial(study)
+    for finished in study.get_trials(deepcopy=False):
+        if not finished.state.is_finished() or (best is not None and finished.number == best.number):
+            continue
+        trial_checkpoint = finished.user_attrs.get('checkpoint')
+        if trial_checkpoint and os.path.exists(trial_checkpoint):
+            os.remove(trial_checkpoint)
+
+def _promote_best_checkpoint(checkpoint_path, study):
+    """Move the best trial's weights to checkpoint_path and delete every other trial checkpoint"""
+    best = _best_completed_trial(study)
+    for trial in study.get_trials(deepcopy=False):
+        trial_checkpoint = trial.user_attrs.get('checkpoint')
+        if not trial_checkpoint or not os.path.exists(trial_checkpoint):
+            continue
+        if best is not None and trial.number == best.number:
+            os.replace(trial_checkpoint, checkpoint_path)
+        else:
+            os.remove(trial_checkpoint)
+
+def _drop_dominated_checkpoints(study, trial):
+    """Study callback: keep trial weights only while the trial is on the Pareto front"""
+    front = {t.number for t in study.best_trials}
+    for finished in study.get_trials(deepcopy=False):
+        # A running trial (another thread) has its checkpoint but is not on the front yet
+        if not finished.state.is_finished():
+            continue
+        trial_checkpoint = finished.user_attrs.get('checkpoint')
+        if finished.number not in front and trial_checkpoint and os.path.exists(trial_checkpoint):
+            os.remove(trial_checkpoint)
+
+def write_checkpoint_scaler(path, scaler):
+    """Store the scaler the checkpoint's weights were trained with in the .h5 file's attributes"""
+    with h5py.File(path, 'a') as f:
+        f.attrs[CHECKPOINT_SCALER_ATTR] = json.dumps(scaler_state(scaler))
+
+def read_checkpoint_scaler(path):
+    """Scaler stored by write_checkpoint_scaler, or None"""
+    with h5py.File(path, 'r') as f:
+        state = f.attrs.get(CHECKPOINT_SCALER_ATTR)
+    return scaler_from_state(json.loads(state)) if state is not None else None
+
+def _journal_storage(path):
+    return optuna.storages.JournalStorage(optuna.storages.journal.JournalFileBackend(path))
+
+def _optimize_in_processes(context, n_trials, n_jobs, profile, checkpoint_path):
+    """Run the study in n_jobs spawned processes sharing the scaled series and a journal storage"""
+    descriptor = context.share()
+    
+    # Split the cores between workers: the profile's thread count (its own, RUNTIME_INTRA_OP_THREADS
+    # or the training pool's cap) is the budget for the whole study, not for each worker
+    worker_profile = dict(profile)
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    threads = min(worker_profile['intra_op_threads'] or cores, cores)
+    worker_profile['intra_op_threads'] = max(1, threads // n_jobs)
+    
+    with tempfile.TemporaryDirectory(prefix="optuna_") as storage_dir:
+        storage_path = os.path.join(storage_dir, "journal.log")
+        study = optuna.create_study(direction='minimize',
+                                    storage=_journal_storage(storage_path),
+                                    pruner=optuna.pruners.HyperbandPruner())
+        
+        # Batches of at most trials_per_process trials, each in a fresh worker process
+        trials_per_process = int(os.environ.get('TUNING_TRIALS_PER_PROCESS', TRIALS_PER_PROCESS))
+        n_batches = max(n_jobs, math.ceil(n_trials / max(1, trials_per_process)))
+        batches = [n_trials // n_batches + (1 if i < n_trials % n_batches else 0) for i in range(n_batches)]
+        # TensorFlow is not fork-safe, so workers start from a fresh interpreter
+        mp_context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=mp_context,
+                                 max_tasks_per_child=1) as executor:
+            futures = [
+                executor.submit(_tuning_worker, descriptor, study.study_name, storage_path,
+                                batch_trials, worker_profile, checkpoint_path)
+                for batch_trials in batches if batch_trials
+            ]
+            for future in futures:
+                future.result()
+        
+        # Copy the results to memory before the journal file is removed
+        trials = optuna.load_study(study_name=study.study_name,
+                                   storage=_journal_storage(storage_path)).get_trials()
+        study = optuna.create_study(direction='minimize')
+        study.add_trials(trials)
+    
+    return study
+
+def _tuning_worker(descriptor, study_name, storage_path, n_trials, profile, checkpoint_path):
+    """Worker process entry point: attach to the shared series and run trials"""
+    context = TuningDataContext.attach(descriptor)
+    try:
+        configure_tensorflow(profile)
+        study = optuna.load_study(study_name=study_name, storage=_journal_storage(storage_path),
+                                  pruner=optuna.pruners.HyperbandPruner())
+        callbacks = [_drop_worse_checkpoints] if checkpoint_path else None
+        study.optimize(_Objective(context, profile, checkpoint_path), n_trials=n_trials, callbacks=callbacks)
+    finally:
+        context.close()
+
+class _MemoryCeiling(keras.callbacks.Callback):
+    """Stop training as soon as the sampled process RSS passes the tuning memory limit"""
+    
+    def __init__(self, sampler, limit_mb):
+        super().__init__()
+        self.sampler = sampler
+        self.limit_mb = limit_mb
+        self.exceeded = False
+    
+    def on_train_batch_end(self, batch, logs=None):
+        if self.sampler.peak_mb > self.limit_mb:
+            self.exceeded = True
+            self.model.stop_training = True
+
+def _enter_trial():
+    global _active_trials
+    with _active_trials_lock:
+        _active_trials += 1
+
+def _release_trial():
+    """Drop the finished trial's Keras state once no other trial in this process is training"""
+    global _active_trials
+    with _active_trials_lock:
+        _active_trials -= 1
+        if _active_trials == 0:
+            # Under the lock, so a thread-parallel trial cannot start building meanwhile
+            keras.backend.clear_session()
+    gc.collect()
+
+def measure_inference_ms(model, repeats=LATENCY_REPEATS):
+    """Latency (ms) of one forecast step through the NumPy serving path, best of repeats"""
+    layers, tensors = extract_layers(model)
+    serving_model = BundleModel(layers, tensors, model.input_shape[1:])
+    X = np.zeros((1,) + tuple(model.input_shape[1:]), dtype=np.float32)
+    serving_model.predict(X)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        serving_model.predict(X)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+def evaluate_with_early_stopping(data, params, trial, profile=None, checkpoint_path=None,
+                                 max_epochs=MAX_EPOCHS, measure_latency=False):
+    """
+    Train model with early stopping and report intermediate values
+    
+    Records params (count), fit_seconds and peak_rss_mb in the trial's user
+    attributes and releases the Keras state afterwards. With
+    TUNING_MEMORY_LIMIT_MB set, a configuration projected to exceed the limit
+    is pruned before training, and training is stopped (pruned) if the
+    process RSS crosses it. In thread-parallel tuning RSS is process-wide.
+    
+    With measure_latency (multi-objective studies, which cannot prune),
+    intermediate values are not reported and inference_ms is recorded.
+    """
+    if profile is None:
+        profile = get_runtime_profile()
+    
+    # Scaled once per tuning session; windows cached per slicing_window
+    context = data if isinstance(data, TuningDataContext) else TuningDataContext.from_series(data)
+    X_train, y_train, X_val, y_val = context.windows(params['slicing_window'])
+    if len(X_val) == 0:
+        # Validation split shorter than the window: nothing to score against
+        return float('inf')
+    
+    memory_limit_mb = get_memory_limit_mb()
+    model = history = None
+    trial_checkpoint = f"{checkpoint_path}.trial{trial.number}.h5" if checkpoint_path else None
+    checkpoint_kept = False
+    _enter_trial()
+    try:
+        # Build model
+        model = build_model(params, X_train.shape[1], profile)
+        n_params = model.count_params()
+        trial.set_user_attr('params', int(n_params))
+        
+        if memory_limit_mb:
+            estimate = estimate_trial_memory_mb(n_params, params['slicing_window'], params['LSTM_units'],
+                                                profile['batch_size'], params.get('recurrent_layers', 2))
+            projected = current_rss_mb() + MEMORY_SAFETY_FACTOR * estimate
+            trial.set_user_attr('projected_rss_mb', round(projected, 1))
+            if projected > memory_limit_mb:
+                trial.set_user_attr('memory_pruned', True)
+                raise optuna.TrialPruned(f"Projected {projected:.0f} MB exceeds the "
+                                         f"{memory_limit_mb:.0f} MB tuning memory limit")
+        
+        # Early stopping callback
+        early_stopping = keras.callbacks.EarlyStopping(
+            monitor='val_loss', patience=5, restore_best_weights=True
+        )
+        
+        # Train with intermediate reporting
+        with RssSampler() as sampler:
+            callbacks = [early_stopping]
+            if trial_checkpoint:
+                # Best-epoch weights: restore_best_weights only applies if early stopping triggers
+                callbacks.append(keras.callbacks.ModelCheckpoint(
+                    trial_checkpoint, monitor='val_loss', save_best_only=True, save_weights_only=True
+                ))
+            ceiling = _MemoryCeiling(sampler, memory_limit_mb) if memory_limit_mb else None
+            if ceiling:
+                callbacks.append(ceiling)
+            fit_start = time.time()
+            # Arrays, or batches gathered on demand when the windows exceed the streaming budget
+            history = model.fit(
+                **fit_inputs(X_train, y_train, X_val, y_val, profile['batch_size']),
+                epochs=max_epochs, #params['epochs']
+                callbacks=callbacks,
+                verbose=0
+            )
+            fit_seconds = time.time() - fit_start
+        
+        # Compute and memory spent, recorded before a possible prune
+        trial.set_user_attr('train_samples', int(len(X_train)))
+        trial.set_user_attr('epochs_run', len(history.history['loss']))
+        trial.set_user_attr('fit_seconds', round(fit_seconds, 3))
+        trial.set_user_attr('peak_rss_mb', round(sampler.peak_mb, 1))
+        trial.set_user_attr('rss_delta_mb', round(sampler.delta_mb, 1))
+        if ceiling and ceiling.exceeded:
+            trial.set_user_attr('memory_pruned', True)
+            raise optuna.TrialPruned(f"RSS reached {sampler.peak_mb:.0f} MB, over the "
+                                     f"{memory_limit_mb:.0f} MB tuning memory limit")
+        
+        if measure_latency:
+            trial.set_user_attr('inference_ms', round(measure_inference_ms(model), 4))
+        else:
+            # Report intermediate values for pruning
+            for epoch, (train_loss, val_loss) in enumerate(zip(history.history['loss'], 
+                                                               history.history['val_loss'])):
+                trial.report(val_loss, epoch)
+                if trial.should_prune():
+                    raise optuna.TrialPruned()
+        
+        # Epoch (1-based) where validation loss bottomed out, and the data size it took
+        val_losses = history.history['val_loss']
+        trial.set_user_attr('best_epoch', int(np.argmin(val_losses)) + 1)
+        
+        if trial_checkpoint and os.path.exists(trial_checkpoint):
+            if context.scaler is not None:
+                write_checkpoint_scaler(trial_checkpoint, context.scaler)
+            trial.set_user_attr('checkpoint', trial_checkpoint)
+            checkpoint_kept = True
+        
+        return min(val_losses)
+    finally:
+        # Pruned or failed trials leave no checkpoint behind
+        if trial_checkpoint and not checkpoint_kept and os.path.exists(trial_checkpoint):
+            os.remove(trial_checkpoint)
+        model = history = None
+        _release_trial()
 
 def create_sequences(data, slicing_window):
     """Create input sequences for LSTM"""
@@ -93,28 +685,31 @@ def create_sequences(data, slicing_window):
     X = X.reshape(X.shape[0], X.shape[1], 1)
     return X, y
 
-def build_model(params, input_shape):
-    """Build LSTM model with given parameters"""
+def build_model(params, input_shape, profile=None):
+    """Build LSTM (or GRU, with params['cell']) model with given parameters"""
+    if profile is None:
+        profile = get_runtime_profile()
+    # Only multi-objective searches set cell/recurrent_layers; other modes keep two LSTM layers
+    recurrent_layer = keras.layers.GRU if params.get('cell', 'lstm') == 'gru' else keras.layers.LSTM
+    recurrent_layers = params.get('recurrent_layers', 2)
     model = keras.models.Sequential()
     model.add(keras.layers.Input(shape=(input_shape, 1)))
-    model.add(keras.layers.LSTM(
-        params['LSTM_units'], 
-        return_sequences=True, 
-    ))
-    
-    model.add(keras.layers.LSTM(
-        params['LSTM_units'], 
-        return_sequences=False
-    ))
+    for index in range(recurrent_layers):
+        model.add(recurrent_layer(
+            params['LSTM_units'], 
+            return_sequences=index < recurrent_layers - 1
+        ))
     
     model.add(keras.layers.Dense(128, activation="relu"))
     model.add(keras.layers.Dropout(params['dropout_rate']))
-    model.add(keras.layers.Dense(1))
+    # Keep the output in float32 so the loss stays stable under mixed precision
+    model.add(keras.layers.Dense(1, dtype='float32'))
     
     model.compile(
         optimizer=keras.optimizers.Adam(learning_rate=0.001),
         loss="mae",
-        metrics=[keras.metrics.RootMeanSquaredError()]
+        metrics=[keras.metrics.RootMeanSquaredError()],
+        jit_compile=profile['jit_compile']
     )
     
     return model
@@ -0,0 +1,71 @@
+"""
+Window inputs for model.fit.
+
+Keras copies NumPy inputs into one tensor before training, so passing the
+(samples, slicing_window, 1) window views of a series materializes
+slicing_window copies of it. Up to STREAMING_WINDOW_BUDGET_MB that is the
+fastest path and windows go in as arrays. Above it, a WindowSequence gathers
+each batch from the (possibly memory-mapped) float32 views on demand, so
+memory stays at one batch whatever the length of the series.
+
+Environment:
+    STREAMING_WINDOW_BUDGET_MB  largest window tensor passed to Keras as arrays (default 256)
+"""
+import os
+import math
+import numpy as np
+from tensorflow import keras
+
+DEFAULT_WINDOW_BUDGET_MB = 256
+
+
+def get_window_budget_mb():
+    return float(os.environ.get('STREAMING_WINDOW_BUDGET_MB', DEFAULT_WINDOW_BUDGET_MB))
+
+
+def window_bytes(X):
+    """Bytes Keras would allocate for a window view (plus its targets) as arrays"""
+    return X.shape[0] * (math.prod(X.shape[1:]) + 1) * np.dtype(np.float32).itemsize
+
+
+class WindowSequence(keras.utils.Sequence):
+    """Float32 batches gathered from window views; sample order is reshuffled every epoch"""
+
+    def __init__(self, X, y, batch_size, shuffle=False, seed=None):
+        super().__init__()
+        self.X = X
+        self.y = y
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self._rng = np.random.default_rng(seed)
+        self._order = self._rng.permutation(len(X)) if shuffle else np.arange(len(X))
+
+    def __len__(self):
+        return math.ceil(len(self.X) / self.batch_size)
+
+    def __getitem__(self, index):
+        # Sorted indices keep reads from a memory-mapped series mostly sequential
+        indices = np.sort(self._order[index * self.batch_size:(index + 1) * self.batch_size])
+        return (np.asarray(self.X[indices], dtype=np.float32),
+                np.asarray(self.y[indices], dtype=np.float32))
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self._order = self._rng.permutation(len(self.X))
+
+
+def fit_inputs(X_train, y_train, X_val, y_val, batch_size):
+    """
+    Keyword arguments for model.fit with the given train and validation windows
+
+    Returns:
+        Dictionary with x, validation_data and either y/batch_size (arrays) or
+        shuffle=False (WindowSequence, which shuffles itself)
+    """
+    if window_bytes(X_train) + window_bytes(X_val) <= get_window_budget_mb() * 2**20:
+        return dict(x=X_train, y=y_train, batch_size=batch_size, validation_data=(X_val, y_val))
+    return dict(
+        x=WindowSequence(X_train, y_train, batch_size, shuffle=True),
+        validation_data=WindowSequence(X_val, y_val, batch_size),
+        shuffle=False
+    )
@@ -2,6 +2,8 @@ from fastapi import FastAPI
 import uvicorn
 
 from api.endpoints import router
+from serving.workloads import shutdown_workloads
+from serving.sharding import get_membership, stop_membership
 
 app = FastAPI(
     title="Trading Model API",
@@ -12,6 +14,18 @@ app = FastAPI(
 # Include your API routes
 app.include_router(router, prefix="/api")
 
+@app.on_event("startup")
+def join_shards():
+    # Starts heartbeating when SHARD_NODE_URL is set (sharded serving)
+    get_membership()
+
+@app.on_event("shutdown")
+def stop_workloads():
+    # Leave the shard ring first so other nodes take over this node's companies
+    stop_membership()
+    # Queued training jobs are cancelled, running ones aborted
+    shutdown_workloads()
+
 @app.get("/")
 async def root():
     return {"message": "Trading Model API", "status": "healthy"}
@@ -0,0 +1,212 @@
+"""
+Materialized post-close forecasts.
+
+A batch job (run after the close, once the new daily bars are available)
+forecasts FORECAST_HORIZON days for every company with a model, in batches
+of models sharing a slicing_window and layer types (narrower models are
+zero-padded to the widest units), and writes them to one compact file next to the
+models (storage/models/.forecasts.snxf):
+
+    8 bytes   magic b'SNXFCST1'
+    8 bytes   little-endian uint64 header length
+    N bytes   UTF-8 JSON header (generation, horizon, per-company row/as_of/model)
+    padding   to a 64-byte boundary
+    ...       float32 forecasts, shaped (companies, FORECAST_HORIZON)
+
+/api/predict memory-maps the file and answers with a dict lookup plus a row
+slice. An entry is stale, and the request falls back to live inference, when
+a newer bar has closed since its as_of date or the company's model changed.
+
+Usage (from stock-prediction-api/):
+    python app/model_ops/forecast_table.py              # build once
+    python app/model_ops/forecast_table.py --follow     # rebuild after every close
+"""
+import os
+import sys
+import json
+import time
+import struct
+import threading
+from datetime import datetime
+import numpy as np
+
+# Forecasts are recursive, so the first N days of a 30-day rollout answer any days_ahead <= 30
+FORECAST_HORIZON = 30
+FORECAST_TABLE_FILENAME = ".forecasts.snxf"
+FORECAST_MAGIC = b'SNXFCST1'
+FORECAST_ALIGNMENT = 64
+
+_PREAMBLE = struct.Struct('<8sQ')
+
+_lock = threading.Lock()
+_table = None
+
+
+def get_forecast_table_path():
+    from model_ops.model_manager import get_models_root
+    return os.path.join(get_models_root(), FORECAST_TABLE_FILENAME)
+
+
+def write_forecast_table(path, entries, forecasts, generation):
+    """
+    Atomically write a forecast table
+
+    Args:
+        path: Destination file
+        entries: Dictionary company -> {'as_of', 'model', 'training_date'}, in row order
+        forecasts: Array shaped (len(entries), FORECAST_HORIZON)
+        generation: Model storage generation the forecasts were computed from
+    """
+    rows = {}
+    for row, (company, entry) in enumerate(entries.items()):
+        rows[company] = dict(entry, row=row)
+    header = json.dumps({
+        'horizon': FORECAST_HORIZON,
+        'generation': generation,
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'rows': rows,
+    }).encode('utf-8')
+    data_offset = _PREAMBLE.size + len(header)
+    data_offset += -data_offset % FORECAST_ALIGNMENT
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(FORECAST_MAGIC, len(header)))
+        f.write(header)
+        f.write(b'\0' * (data_offset - _PREAMBLE.size - len(header)))
+        f.write(np.ascontiguousarray(forecasts, dtype=np.float32).tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_forecast_table(path):
+    """Header dict plus a memory-mapped (companies, horizon) float32 array"""
+    with open(path, 'rb') as f:
+        magic, header_length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != FORECAST_MAGIC:
+            raise ValueError(f"{path} is not a forecast table")
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    data_offset = _PREAMBLE.size + header_length
+    data_offset += -data_offset % FORECAST_ALIGNMENT
+    shape = (len(header['rows']), header['horizon'])
+    if shape[0] == 0:
+        return header, np.zeros(shape, dtype=np.float32)
+    return header, np.memmap(path, dtype=np.float32, mode='r', offset=data_offset, shape=shape)
+
+
+def _current_table():
+    """Cached table, reloaded when the file is replaced"""
+    global _table
+    path = get_forecast_table_path()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        _table = None
+        return None
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        if _table is None or _table[0] != key:
+            header, forecasts = read_forecast_table(path)
+            _table = (key, header, forecasts)
+        return _table
+
+
+def _is_fresh(header, entry, company):
+    from data_pipeline.trading_calendar import last_completed_session
+    from model_ops.model_manager import get_models_root, get_models_generation, _list_model_versions
+
+    if entry['as_of'] != last_completed_session().isoformat():
+        return False
+    if header['generation'] == get_models_generation():
+        return True
+    # Some model changed since the table was built: check this company's latest version
+    company_dir = os.path.join(get_models_root(), company)
+    versions = _list_model_versions(company_dir) if os.path.isdir(company_dir) else []
+    return bool(versions) and versions[0] == entry['model']
+
+
+def lookup_forecast(company, days_ahead):
+    """
+    Materialized forecast for a company, if fresh
+
+    Returns:
+        Array of days_ahead prices, or None when the table is missing, stale,
+        has no entry for the company or a shorter horizon
+    """
+    table = _current_table()
+    if table is None:
+        return None
+    _, header, forecasts = table
+    entry = header['rows'].get(company)
+    if entry is None or days_ahead > header['horizon'] or not _is_fresh(header, entry, company):
+        return None
+    return np.array(forecasts[entry['row'], :days_ahead], dtype=np.float64)
+
+
+def build_forecast_table(companies=None):
+    """
+    Forecast FORECAST_HORIZON days for every company with a model and publish the table
+
+    Returns:
+        Dictionary with the companies written and the ones that failed
+    """
+    from data_pipeline.data_loader import load_recent_bars
+    from data_pipeline.trading_calendar import last_completed_session
+    from model_ops.model_manager import (
+        load_model_package, get_all_companies_with_models, get_models_generation
+    )
+    from model_ops.model_predictor import predict_future_batch
+
+    start_time = time.time()
+    # Read first: a model published while the job runs is caught by the per-company check
+    generation = get_models_generation()
+    as_of = last_completed_session()
+    companies = companies or get_all_companies_with_models()
+
+    packages, windows, entries, failed = [], [], {}, {}
+    for company in companies:
+        try:
+            package = load_model_package(company)
+            slicing_window = package['metadata']['slicing_window']
+            bars = load_recent_bars(company, slicing_window, end=as_of)
+        except Exception as e:
+            print(f"Skipping {company}: {e}")
+            failed[company] = str(e)
+            continue
+        packages.append(package)
+        windows.append(bars.values)
+        entries[company] = {
+            # The provider may not have the newest bar yet; such rows stay stale until the next run
+            'as_of': bars.index[-1].date().isoformat(),
+            'model': os.path.splitext(os.path.basename(package['model_path']))[0],
+            'training_date': package['metadata'].get('training_date'),
+        }
+
+    # Tuned models rarely share their units: pad them so each slicing_window is one pass
+    forecasts = (predict_future_batch(packages, windows, FORECAST_HORIZON, pad_widths=True) if packages
+                 else np.zeros((0, FORECAST_HORIZON)))
+    write_forecast_table(get_forecast_table_path(), entries, forecasts, generation)
+    print(f"Forecast table: {len(entries)} companies as of {as_of.isoformat()}, "
+          f"{len(failed)} failed, {time.time() - start_time:.2f}s")
+    return {'companies': list(entries), 'failed': failed}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    # Add the app directory to Python path
+    sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+    from data_pipeline.trading_calendar import next_session_close
+
+    parser = argparse.ArgumentParser(description="Materialize post-close forecasts for every company")
+    parser.add_argument('companies', nargs='*', help="Companies to forecast (default: all with models)")
+    parser.add_argument('--follow', action='store_true', help="Keep running and rebuild after every close")
+    parser.add_argument('--delay-minutes', type=float, default=20.0,
+                        help="With --follow, wait this long after the close for the new bars to land")
+    args = parser.parse_args()
+
+    build_forecast_table(args.companies)
+    while args.follow:
+        run_at = next_session_close().timestamp() + args.delay_minutes * 60
+        print(f"Next forecast run at {datetime.fromtimestamp(run_at).isoformat(timespec='minutes')}")
+        time.sleep(max(0.0, run_at - time.time()))
+        build_forecast_table(args.companies)
@@ -0,0 +1,593 @@
+"""
+Single-file model bundle (.snxb) with memory-mapped weights.
+
+Layout:
+    [0:8]    magic b'SNXBNDL1'
+    [8:16]   header length (uint64, little endian)
+    [16:..]  JSON header: metadata, scaler mean/scale, training history,
+             layer specs and the tensor table
+    padding up to BUNDLE_ALIGNMENT
+    weight blob: raw little-endian tensors, each starting on BUNDLE_ALIGNMENT
+
+The weight blob is opened with np.memmap, so loading a bundle only parses the
+header and every process reading the same file shares the page cache. The
+forward pass runs in NumPy directly on those pages (no TensorFlow needed to serve).
+
+A bundle may also carry an int8 variant of its kernels (model_ops/quantization.py);
+the header says whether it serves, and only the serving variant's pages are read.
+
+Usage (from stock-prediction-api/) to convert existing storage/models packages:
+    python app/model_ops/model_bundle.py [COMPANY ...] [--remove-legacy]
+"""
+import os
+import sys
+import json
+import struct
+import pickle
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+BUNDLE_EXTENSION = '.snxb'
+BUNDLE_MAGIC = b'SNXBNDL1'
+BUNDLE_VERSION = 1
+BUNDLE_ALIGNMENT = 64
+
+_PREAMBLE = struct.Struct('<8sQ')
+
+
+def _align(offset):
+    return (offset + BUNDLE_ALIGNMENT - 1) // BUNDLE_ALIGNMENT * BUNDLE_ALIGNMENT
+
+
+def _to_json_value(value):
+    """Convert numpy scalars/arrays found in params and history to JSON types"""
+    if isinstance(value, dict):
+        return {str(k): _to_json_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json_value(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _activation_name(activation):
+    return getattr(activation, '__name__', str(activation))
+
+
+def extract_layers(model):
+    """
+    Describe a trained Keras model as NumPy-executable layer specs
+
+    Returns:
+        Tuple (layers, tensors) - list of layer spec dicts and a dict of
+        tensor name -> float32 array referenced by the specs
+    """
+    layers, tensors = [], {}
+    for index, layer in enumerate(model.layers):
+        kind = layer.__class__.__name__
+        if kind == 'Dropout':
+            # Identity at inference time
+            continue
+
+        weights = layer.get_weights()
+        if kind == 'LSTM':
+            spec = {
+                'type': 'lstm',
+                'units': layer.units,
+                'return_sequences': layer.return_sequences,
+                'activation': _activation_name(layer.activation),
+                'recurrent_activation': _activation_name(layer.recurrent_activation),
+            }
+            names = ['kernel', 'recurrent_kernel', 'bias']
+        elif kind == 'GRU':
+            if not layer.reset_after:
+                raise ValueError("Only GRU layers with reset_after=True are supported by the bundle format")
+            spec = {
+                'type': 'gru',
+                'units': layer.units,
+                'return_sequences': layer.return_sequences,
+                'activation': _activation_name(layer.activation),
+                'recurrent_activation': _activation_name(layer.recurrent_activation),
+            }
+            # Keras keeps both biases in one (2, 3 * units) array
+            weights = [weights[0], weights[1], weights[2][0], weights[2][1]]
+            names = ['kernel', 'recurrent_kernel', 'bias', 'recurrent_bias']
+        elif kind == 'Dense':
+            spec = {
+                'type': 'dense',
+                'units': layer.units,
+                'activation': _activation_name(layer.activation),
+            }
+            names = ['kernel', 'bias']
+        else:
+            raise ValueError(f"Layer type {kind} is not supported by the bundle format")
+
+        spec['weights'] = []
+        for name, array in zip(names, weights):
+            tensor_name = f"layer{index}/{name}"
+            tensors[tensor_name] = np.asarray(array, dtype=np.float32)
+            spec['weights'].append(tensor_name)
+        layers.append(spec)
+
+    return layers, tensors
+
+
+def write_bundle(path, layers, tensors, input_shape, scaler, metadata, training_history=None,
+                 keras_config=None, quantization=None):
+    """
+    Write a model bundle
+
+    Args:
+        path: Destination .snxb file
+        layers: Layer specs (see extract_layers)
+        tensors: Dictionary of tensor name -> array
+        input_shape: (slicing_window, features) expected by the model
+        scaler: Fitted StandardScaler
+        metadata: Metadata dictionary (same content as the legacy _metadata.json)
+        training_history: Training history from model.fit() (optional)
+        keras_config: model.to_json() output, to rebuild a Keras model (optional)
+        quantization: {'scheme', 'mapping', 'selected'} when tensors include an
+            int8 variant; mapping is float name -> [int8 name, scale name] (optional)
+    """
+    table = {}
+    offset = 0
+    for name, array in tensors.items():
+        array = np.ascontiguousarray(array)
+        table[name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset,
+            'nbytes': int(array.nbytes),
+        }
+        offset = _align(offset + array.nbytes)
+
+    header = {
+        'format_version': BUNDLE_VERSION,
+        'metadata': _to_json_value(metadata),
+        'scaler': scaler_state(scaler),
+        'history': _to_json_value(training_history or {}),
+        'input_shape': list(input_shape),
+        'layers': layers,
+        'tensors': table,
+        'keras_config': keras_config,
+        'quantization': quantization,
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = _align(_PREAMBLE.size + len(header_bytes))
+
+    # Write to a temporary file first so readers never see a partial bundle
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(BUNDLE_MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in tensors.items():
+            f.seek(data_start + table[name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_model_bundle(path, model, scaler, metadata, training_history=None, quantization=None):
+    """Write a bundle straight from a trained Keras model (plus its quantize_model() variant)"""
+    layers, tensors = extract_layers(model)
+    header_quantization = None
+    if quantization:
+        # Appended after the float tensors, so each variant's pages stay contiguous
+        tensors.update(quantization['tensors'])
+        report = quantization['report']
+        header_quantization = {'scheme': report['scheme'], 'mapping': quantization['mapping'],
+                               'selected': report['selected']}
+        metadata = dict(metadata, quantization=report)
+    return write_bundle(
+        path, layers, tensors,
+        input_shape=model.input_shape[1:],
+        scaler=scaler,
+        metadata=metadata,
+        training_history=training_history,
+        keras_config=model.to_json(),
+        quantization=header_quantization,
+    )
+
+
+def read_bundle_header(path):
+    """Read only the JSON header of a bundle"""
+    with open(path, 'rb') as f:
+        magic, header_len = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != BUNDLE_MAGIC:
+            raise ValueError(f"{path} is not a model bundle")
+        header = json.loads(f.read(header_len).decode('utf-8'))
+    if header['format_version'] > BUNDLE_VERSION:
+        raise ValueError(f"{path} uses bundle format {header['format_version']}, "
+                         f"newest supported is {BUNDLE_VERSION}")
+    header['data_offset'] = _align(_PREAMBLE.size + header_len)
+    return header
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+_ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0.0),
+    'tanh': np.tanh,
+    'sigmoid': _sigmoid,
+}
+
+
+class BundleModel:
+    """
+    NumPy forward pass over bundle weights
+
+    Exposes predict(X, verbose=0) like a Keras model so predict_future works
+    unchanged. Weights are read-only views into the memory-mapped file.
+    Weights listed in scales are int8 and dequantized per call (w * scale).
+    """
+
+    def __init__(self, layers, weights, input_shape, keras_config=None, scales=None):
+        self.layers = layers
+        self.weights = weights
+        self.input_shape = (None,) + tuple(input_shape)
+        self.keras_config = keras_config
+        self.scales = scales or {}
+        self._keras_model = None
+
+    def _weight(self, name):
+        scale = self.scales.get(name)
+        return self.weights[name] if scale is None else self.weights[name] * scale
+
+    def _lstm(self, spec, x):
+        kernel, recurrent_kernel, bias = (self._weight(name) for name in spec['weights'])
+        units = spec['units']
+        activation = _ACTIVATIONS[spec['activation']]
+        recurrent_activation = _ACTIVATIONS[spec['recurrent_activation']]
+
+        # Leading axes are batch dims: (batch, steps, features), or
+        # (models, batch, steps, features) for stack_models()
+        steps = x.shape[-2]
+        # Input projection for every timestep at once
+        x_proj = x @ kernel + bias
+        h = np.zeros(x.shape[:-2] + (units,), dtype=np.float32)
+        c = np.zeros(x.shape[:-2] + (units,), dtype=np.float32)
+        outputs = []
+        for t in range(steps):
+            z = x_proj[..., t, :] + h @ recurrent_kernel
+            i = recurrent_activation(z[..., :units])
+            f = recurrent_activation(z[..., units:2 * units])
+            g = activation(z[..., 2 * units:3 * units])
+            o = recurrent_activation(z[..., 3 * units:])
+            c = f * c + i * g
+            h = o * activation(c)
+            if spec['return_sequences']:
+                outputs.append(h)
+        return np.stack(outputs, axis=-2) if spec['return_sequences'] else h
+
+    def _gru(self, spec, x):
+        kernel, recurrent_kernel, bias, recurrent_bias = (self._weight(name) for name in spec['weights'])
+        units = spec['units']
+        activation = _ACTIVATIONS[spec['activation']]
+        recurrent_activation = _ACTIVATIONS[spec['recurrent_activation']]
+
+        # Gates are ordered update (z), reset (r), candidate; reset_after=True
+        steps = x.shape[-2]
+        x_proj = x @ kernel + bias
+        h = np.zeros(x.shape[:-2] + (units,), dtype=np.float32)
+        outputs = []
+        for t in range(steps):
+            x_t = x_proj[..., t, :]
+            h_proj = h @ recurrent_kernel + recurrent_bias
+            z = recurrent_activation(x_t[..., :units] + h_proj[..., :units])
+            r = recurrent_activation(x_t[..., units:2 * units] + h_proj[..., units:2 * units])
+            candidate = activation(x_t[..., 2 * units:] + r * h_proj[..., 2 * units:])
+            h = z * h + (1.0 - z) * candidate
+            if spec['return_sequences']:
+                outputs.append(h)
+        return np.stack(outputs, axis=-2) if spec['return_sequences'] else h
+
+    def _dense(self, spec, x):
+        kernel, bias = (self._weight(name) for name in spec['weights'])
+        return _ACTIVATIONS[spec['activation']](x @ kernel + bias)
+
+    def predict(self, X, verbose=0):
+        """Run the model on a batch shaped (batch, slicing_window, features)"""
+        x = np.asarray(X, dtype=np.float32)
+        for spec in self.layers:
+            x = getattr(self, f"_{spec['type']}")(spec, x)
+        return x
+
+    def __call__(self, X):
+        return self.predict(X)
+
+    def count_params(self):
+        return int(sum(self.weights[name].size for spec in self.layers for name in spec['weights']))
+
+    def keras_model(self):
+        """Rebuild the equivalent Keras model (imports TensorFlow)"""
+        if self._keras_model is None:
+            if self.keras_config is None:
+                raise ValueError("Bundle was written without a Keras config")
+            from tensorflow import keras
+            model = keras.models.model_from_json(self.keras_config)
+            # Specs follow model.layers order, which is also get_weights() order
+            weights = []
+            for spec in self.layers:
+                tensors = [np.array(self._weight(name)) for name in spec['weights']]
+                if spec['type'] == 'gru':
+                    tensors = tensors[:2] + [np.stack(tensors[2:])]
+                weights.extend(tensors)
+            model.set_weights(weights)
+            self._keras_model = model
+        return self._keras_model
+
+
+def architecture_key(model):
+    """
+    Hashable description of a bundle model's layers and weight shapes and dtypes
+
+    Models with equal keys can be evaluated together with stack_models().
+    Returns None for models that are not NumPy bundle models (legacy Keras).
+    """
+    if not isinstance(model, BundleModel):
+        return None
+    layers = tuple(
+        (spec['type'], spec['units'], spec.get('return_sequences'), spec['activation'],
+         spec.get('recurrent_activation'),
+         tuple((model.weights[name].shape, model.weights[name].dtype.str) for name in spec['weights']))
+        for spec in model.layers
+    )
+    return model.input_shape[1:], layers
+
+
+# Broadcast shape per weight role: kernels multiply (models, batch, steps, features)
+# inputs, recurrent kernels and dense kernels (models, batch, units) states
+_STACKED_SHAPES = {
+    'lstm': (lambda w: w[:, np.newaxis], lambda w: w, lambda w: w[:, np.newaxis, np.newaxis]),
+    'gru': (lambda w: w[:, np.newaxis], lambda w: w, lambda w: w[:, np.newaxis, np.newaxis],
+            lambda w: w[:, np.newaxis]),
+    'dense': (lambda w: w, lambda w: w[:, np.newaxis]),
+}
+
+
+def stack_models(models):
+    """
+    Combine same-architecture bundle models into one batched model
+
+    The returned model's predict() takes inputs shaped (models, batch,
+    slicing_window, features) and runs every model in one pass per layer.
+    """
+    first = models[0]
+    key = architecture_key(first)
+    if key is None or any(architecture_key(model) != key for model in models[1:]):
+        raise ValueError("stack_models needs bundle models with identical architectures")
+
+    weights, scales = {}, {}
+    for layer_index, spec in enumerate(first.layers):
+        for position, name in enumerate(spec['weights']):
+            names = [model.layers[layer_index]['weights'][position] for model in models]
+            weights[name] = _STACKED_SHAPES[spec['type']][position](
+                np.stack([model.weights[n] for model, n in zip(models, names)]))
+            if name in first.scales:
+                # (models, channels) -> singleton axes matching the stacked kernel, channels last
+                stacked = np.stack([model.scales[n] for model, n in zip(models, names)])
+                scales[name] = stacked.reshape(stacked.shape[:1] + (1,) * (weights[name].ndim - 2)
+                                               + stacked.shape[1:])
+    return BundleModel(first.layers, weights, first.input_shape[1:], scales=scales)
+
+
+def stacking_key(model):
+    """
+    Like architecture_key, but ignoring layer widths and weight dtypes
+
+    Models with equal keys (same layer types and slicing_window) can be
+    evaluated together after pad_models(). Returns None for legacy Keras models.
+    """
+    if not isinstance(model, BundleModel):
+        return None
+    layers = tuple(
+        (spec['type'], spec.get('return_sequences'), spec['activation'], spec.get('recurrent_activation'))
+        for spec in model.layers
+    )
+    return model.input_shape[1:], layers
+
+
+# Recurrent layers keep their gates side by side along the last weight axis
+_GATES = {'lstm': 4, 'gru': 3}
+
+
+def _pad_axis(weight, axis, size):
+    padding = [(0, 0)] * weight.ndim
+    padding[axis] = (0, size - weight.shape[axis])
+    return np.pad(weight, padding)
+
+
+def _pad_gates(weight, gates, units, width):
+    """(..., gates * units) -> (..., gates * width), zero-padding each gate block"""
+    blocks = weight.reshape(weight.shape[:-1] + (gates, units))
+    return _pad_axis(blocks, -1, width).reshape(weight.shape[:-1] + (gates * width,))
+
+
+def pad_models(models):
+    """
+    Zero-pad models sharing a stacking_key to the widest units of each layer
+
+    Padded units get zero incoming and outgoing weights, so they never affect
+    the output and predictions are unchanged. int8 weights are dequantized.
+
+    Returns:
+        List of float32 BundleModels with identical architecture_key
+    """
+    widths = [max(model.layers[i]['units'] for model in models) for i in range(len(models[0].layers))]
+    padded = []
+    for model in models:
+        layers, weights = [], {}
+        in_width = model.input_shape[-1]
+        for spec, width in zip(model.layers, widths):
+            tensors = [np.asarray(model._weight(name), dtype=np.float32) for name in spec['weights']]
+            gates = _GATES.get(spec['type'])
+            if gates:
+                kernel, recurrent_kernel, *biases = tensors
+                tensors = [
+                    _pad_gates(_pad_axis(kernel, 0, in_width), gates, spec['units'], width),
+                    _pad_gates(_pad_axis(recurrent_kernel, 0, width), gates, spec['units'], width),
+                ] + [_pad_gates(bias, gates, spec['units'], width) for bias in biases]
+            else:
+                kernel, bias = tensors
+                tensors = [_pad_axis(_pad_axis(kernel, 0, in_width), 1, width), _pad_axis(bias, 0, width)]
+            weights.update(zip(spec['weights'], tensors))
+            layers.append(dict(spec, units=width))
+            in_width = width
+        padded.append(BundleModel(layers, weights, model.input_shape[1:]))
+    return padded
+
+
+def scaler_state(scaler):
+    """JSON-serializable statistics of a fitted StandardScaler"""
+    return {
+        'mean': np.asarray(scaler.mean_, dtype=np.float64).tolist(),
+        'scale': np.asarray(scaler.scale_, dtype=np.float64).tolist(),
+        'var': np.asarray(scaler.var_, dtype=np.float64).tolist(),
+        'n_samples_seen': int(np.max(scaler.n_samples_seen_)),
+    }
+
+
+def scaler_from_state(state):
+    """StandardScaler rebuilt from scaler_state()"""
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(state['mean'], dtype=np.float64)
+    scaler.scale_ = np.asarray(state['scale'], dtype=np.float64)
+    scaler.var_ = np.asarray(state['var'], dtype=np.float64)
+    scaler.n_samples_seen_ = state['n_samples_seen']
+    scaler.n_features_in_ = len(scaler.mean_)
+    return scaler
+
+
+def read_bundle(path, mmap=True, precision=None):
+    """
+    Load a bundle as a model package
+
+    Args:
+        path: .snxb file
+        mmap: Memory-map the weight blob (default) instead of reading it into memory
+        precision: 'float32' or 'int8' (default: int8 when the bundle selected
+            its int8 variant and MODEL_QUANTIZATION is not 'off')
+
+    Returns:
+        Dictionary with model, scaler, metadata, history, model_path and
+        precision, the same shape load_model_package returns for legacy packages
+    """
+    header = read_bundle_header(path)
+    if mmap:
+        blob = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        with open(path, 'rb') as f:
+            blob = np.frombuffer(f.read(), dtype=np.uint8)
+
+    weights = {}
+    for name, entry in header['tensors'].items():
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape'])) if entry['shape'] else 1
+        weights[name] = np.frombuffer(
+            blob, dtype=dtype, count=count, offset=header['data_offset'] + entry['offset']
+        ).reshape(entry['shape'])
+
+    quantization = header.get('quantization')
+    if precision is None:
+        # Imported here so the converter runs as a script before app/ is on sys.path
+        from model_ops.quantization import quantization_enabled
+        precision = 'int8' if quantization and quantization['selected'] and quantization_enabled() else 'float32'
+    if precision == 'int8' and not quantization:
+        raise ValueError(f"{path} has no int8 variant")
+
+    layer_weights, scales = {}, {}
+    for spec in header['layers']:
+        for name in spec['weights']:
+            if precision == 'int8' and name in quantization['mapping']:
+                int8_name, scale_name = quantization['mapping'][name]
+                layer_weights[name] = weights[int8_name]
+                scales[name] = weights[scale_name]
+            else:
+                layer_weights[name] = weights[name]
+
+    model = BundleModel(header['layers'], layer_weights, header['input_shape'], header.get('keras_config'),
+                        scales=scales)
+    return {
+        'model': model,
+        'scaler': scaler_from_state(header['scaler']),
+        'metadata': header['metadata'],
+        'history': header['history'],
+        'model_path': path,
+        'precision': precision
+    }
+
+
+def convert_legacy_package(company_dir, base_filename, remove_legacy=False):
+    """
+    Convert a legacy .keras/_scaler.pkl/_metadata.json/_history.pkl package to a bundle
+
+    Returns:
+        Path of the written bundle
+    """
+    import tensorflow as tf
+
+    model_path = os.path.join(company_dir, f"{base_filename}.keras")
+    scaler_path = os.path.join(company_dir, f"{base_filename}_scaler.pkl")
+    metadata_path = os.path.join(company_dir, f"{base_filename}_metadata.json")
+    history_path = os.path.join(company_dir, f"{base_filename}_history.pkl")
+
+    try:
+        model = tf.keras.models.load_model(model_path, safe_mode=False)
+    except TypeError:
+        model = tf.keras.models.load_model(model_path)
+    with open(scaler_path, 'rb') as f:
+        scaler = pickle.load(f)
+    with open(metadata_path, 'r') as f:
+        metadata = json.load(f)
+    history = {}
+    if os.path.exists(history_path):
+        with open(history_path, 'rb') as f:
+            history = pickle.load(f)
+
+    bundle_path = os.path.join(company_dir, f"{base_filename}{BUNDLE_EXTENSION}")
+    write_model_bundle(bundle_path, model, scaler, metadata, history)
+
+    # Check the NumPy path reproduces Keras before dropping the originals
+    probe = np.linspace(-1.0, 1.0, model.input_shape[1], dtype=np.float32).reshape(1, -1, 1)
+    expected = model.predict(probe, verbose=0)
+    actual = read_bundle(bundle_path)['model'].predict(probe)
+    if not np.allclose(expected, actual, atol=1e-4):
+        os.remove(bundle_path)
+        raise ValueError(f"Bundle output mismatch for {base_filename}: {expected} vs {actual}")
+
+    if remove_legacy:
+        for legacy_path in (model_path, scaler_path, metadata_path, history_path):
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
+    return bundle_path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    # Add the app directory to Python path
+    sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+    from model_ops.model_manager import get_models_root, get_all_companies_with_models
+
+    parser = argparse.ArgumentParser(description="Convert legacy model packages to .snxb bundles")
+    parser.add_argument('companies', nargs='*', help="Companies to convert (default: all)")
+    parser.add_argument('--remove-legacy', action='store_true', help="Delete the legacy files after converting")
+    args = parser.parse_args()
+
+    for company in args.companies or get_all_companies_with_models():
+        company_dir = os.path.join(get_models_root(), company)
+        for filename in sorted(os.listdir(company_dir)):
+            if not filename.endswith('.keras'):
+                continue
+            base_filename = filename[:-len('.keras')]
+            try:
+                bundle_path = convert_legacy_package(company_dir, base_filename, args.remove_legacy)
+                print(f"Converted {company}/{base_filename} -> {os.path.basename(bundle_path)}")
+            except Exception as e:
+                print(f"Could not convert {company}/{base_filename}: {e}")
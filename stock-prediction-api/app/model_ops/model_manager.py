@@ -1,10 +1,81 @@
 import pickle
 import json
 import os
+import time
 from datetime import datetime
-import tensorflow as tf
+from model_ops.model_bundle import (
+    BUNDLE_EXTENSION, write_model_bundle, read_bundle, read_bundle_header
+)
 
-def save_model_package(company, model, scaler, best_params, training_history, lookback_period):
+# 'bundle' writes a single memory-mappable .snxb file, 'legacy' the original
+# .keras + _scaler.pkl + _metadata.json + _history.pkl set
+MODEL_FORMAT = os.environ.get('MODEL_FORMAT', 'bundle')
+# Versions kept per company (older ones are deleted when a new one is saved)
+MODEL_KEEP_VERSIONS = int(os.environ.get('MODEL_KEEP_VERSIONS', 1))
+
+def get_models_root():
+    """Absolute path of storage/models (MODEL_STORAGE_DIR overrides it)"""
+    if os.environ.get('MODEL_STORAGE_DIR'):
+        return os.path.abspath(os.environ['MODEL_STORAGE_DIR'])
+    # current_file_dir = /stock-prediction-api/app/model_ops
+    current_file_dir = os.path.dirname(__file__)
+    # Go up TWO levels to get to project root
+    project_root = os.path.dirname(os.path.dirname(current_file_dir))
+    return os.path.join(project_root, "storage/models")
+
+def _list_model_versions(company_dir):
+    """Base filenames of every saved model (bundle or legacy), most recent first"""
+    versions = set()
+    for filename in os.listdir(company_dir):
+        if filename.endswith(BUNDLE_EXTENSION):
+            versions.add(filename[:-len(BUNDLE_EXTENSION)])
+        elif filename.endswith('.keras'):
+            versions.add(filename[:-len('.keras')])
+    # Base filenames end with the _%Y%m%d_%H%M%S training timestamp
+    return sorted(versions, key=lambda name: name.rsplit('_', 2)[-2:], reverse=True)
+
+def _version_files(company_dir, base_filename):
+    """Every file belonging to one saved version (bundle or legacy set)"""
+    return [filename for filename in os.listdir(company_dir)
+            if filename.startswith(base_filename)
+            and filename[len(base_filename):] in (BUNDLE_EXTENSION, '.keras', '_scaler.pkl',
+                                                  '_metadata.json', '_history.pkl')]
+
+def _prune_versions(company_dir, keep):
+    """Delete all but the keep most recent versions"""
+    for base_filename in _list_model_versions(company_dir)[keep:]:
+        for filename in _version_files(company_dir, base_filename):
+            try:
+                os.remove(os.path.join(company_dir, filename))
+                print(f"Deleted: {filename}")
+            except Exception as e:
+                print(f"Could not delete {filename}: {e}")
+
+def get_models_generation():
+    """
+    Current storage generation, changed whenever a model is published or deleted
+
+    Serving processes compare it to decide when cached models are stale.
+    """
+    generation_path = os.path.join(get_models_root(), ".generation")
+    try:
+        with open(generation_path, 'r') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return "0"
+
+def _publish_models_generation():
+    """Signal readers (registry caches, pre-fork master) that storage/models changed"""
+    models_root = get_models_root()
+    os.makedirs(models_root, exist_ok=True)
+    generation_path = os.path.join(models_root, ".generation")
+    tmp_path = f"{generation_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp_path, generation_path)
+
+def save_model_package(company, model, scaler, best_params, training_history, lookback_period,
+                       model_format=None, quantization=None, keep_versions=None):
     """
     Save complete model package including model, scaler, and metadata
     
@@ -15,42 +86,23 @@ def save_model_package(company, model, scaler, best_params, training_history, lo
         training_history: Training history from model.fit()
         company: Stock ticker (used as primary identifier)
         lookback_period: Training data period
+        model_format: 'bundle' or 'legacy' (optional - MODEL_FORMAT env var if None)
+        quantization: quantize_model() result stored as the bundle's int8 variant (optional)
+        keep_versions: Versions to keep, including this one (optional - MODEL_KEEP_VERSIONS if None)
     """
+    model_format = model_format or MODEL_FORMAT
+    keep_versions = max(1, keep_versions or MODEL_KEEP_VERSIONS)
     
     # Get absolute path to company directory
-    current_file_dir = os.path.dirname(__file__)
-    project_root = os.path.dirname(os.path.dirname(current_file_dir))
-    company_dir = os.path.join(project_root, "storage/models", company)
+    company_dir = os.path.join(get_models_root(), company)
     
     # Create company directory
     os.makedirs(company_dir, exist_ok=True)
     
-    # Delete existing models for this company
-    existing_files = os.listdir(company_dir) if os.path.exists(company_dir) else []
-    if existing_files:
-        print(f"Replacing existing model for {company}")
-        for filename in existing_files:
-            file_path = os.path.join(company_dir, filename)
-            try:
-                os.remove(file_path)
-                print(f"Deleted: {filename}")
-            except Exception as e:
-                print(f"Could not delete {filename}: {e}")
-    
     # Generate filename with timestamp
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     base_filename = f"{company}_{lookback_period}_{timestamp}"
     
-    # 1. Save Keras model (native format - NOT pickle)
-    model_path = os.path.join(company_dir, f"{base_filename}.keras")
-    model.save(model_path)
-    
-    # 2. Save scaler with pickle
-    scaler_path = os.path.join(company_dir, f"{base_filename}_scaler.pkl")
-    with open(scaler_path, 'wb') as f:
-        pickle.dump(scaler, f)
-    
-    # 3. Save metadata as JSON
     metadata = {
         'company': company,
         'lookback_period': lookback_period,
@@ -60,12 +112,38 @@ def save_model_package(company, model, scaler, best_params, training_history, lo
         'final_validation_loss': training_history['val_loss'][-1] if training_history['val_loss'] else None,
         'slicing_window': best_params['slicing_window'],
         'model_architecture': {
+            'cell': best_params.get('cell', 'lstm'),
+            'recurrent_layers': best_params.get('recurrent_layers', 2),
             'LSTM_units': best_params['LSTM_units'],
             'dropout_rate': best_params['dropout_rate'],
             'learning_rate': 0.001
         }
     }
     
+    if model_format == 'bundle':
+        # Single file: weights, scaler, metadata and history together
+        bundle_path = os.path.join(company_dir, f"{base_filename}{BUNDLE_EXTENSION}")
+        write_model_bundle(bundle_path, model, scaler, metadata, training_history, quantization)
+        # Older versions go only once the new one is complete
+        _prune_versions(company_dir, keep_versions)
+        _publish_models_generation()
+        return {
+            'model_path': bundle_path
+        }
+    
+    if quantization:
+        print("Legacy format has no int8 variant, saving float weights only")
+    
+    # 1. Save Keras model (native format - NOT pickle)
+    model_path = os.path.join(company_dir, f"{base_filename}.keras")
+    model.save(model_path)
+    
+    # 2. Save scaler with pickle
+    scaler_path = os.path.join(company_dir, f"{base_filename}_scaler.pkl")
+    with open(scaler_path, 'wb') as f:
+        pickle.dump(scaler, f)
+    
+    # 3. Save metadata as JSON
     metadata_path = os.path.join(company_dir, f"{base_filename}_metadata.json")
     with open(metadata_path, 'w') as f:
         json.dump(metadata, f, indent=2)
@@ -75,6 +153,8 @@ def save_model_package(company, model, scaler, best_params, training_history, lo
     with open(history_path, 'wb') as f:
         pickle.dump(training_history, f)
     
+    _prune_versions(company_dir, keep_versions)
+    _publish_models_generation()
     return {
         'model_path': model_path,
         'scaler_path': scaler_path,
@@ -94,9 +174,7 @@ def load_model_package(company, model_filename=None):
         Dictionary with loaded model, scaler, and metadata
     """
     # Get absolute path to company directory
-    current_file_dir = os.path.dirname(__file__)
-    project_root = os.path.dirname(os.path.dirname(current_file_dir))
-    company_dir = os.path.join(project_root, "storage/models", company)
+    company_dir = os.path.join(get_models_root(), company)
     
     print(f"DEBUG: Loading model from: {company_dir}")
     
@@ -106,22 +184,29 @@ def load_model_package(company, model_filename=None):
     # Find model to load
     if model_filename is None:
         # Load latest model
-        model_files = [f for f in os.listdir(company_dir) if f.endswith('.keras')]
-        if not model_files:
+        versions = _list_model_versions(company_dir)
+        if not versions:
             raise FileNotFoundError(f"No models found for company {company}")
-        model_files.sort(reverse=True)  # Most recent first
-        base_filename = model_files[0].replace('.keras', '')
+        base_filename = versions[0]
         print(f"DEBUG: Loading latest model: {base_filename}")
     else:
         base_filename = model_filename
         print(f"DEBUG: Loading specific model: {base_filename}")
     
+    # Bundles hold everything in one memory-mapped file
+    bundle_path = os.path.join(company_dir, f"{base_filename}{BUNDLE_EXTENSION}")
+    if os.path.exists(bundle_path):
+        package = read_bundle(bundle_path)
+        print(f"DEBUG: Successfully loaded model bundle for {company}")
+        return package
+    
     # Load components
     model_path = os.path.join(company_dir, f"{base_filename}.keras")
     scaler_path = os.path.join(company_dir, f"{base_filename}_scaler.pkl")
     metadata_path = os.path.join(company_dir, f"{base_filename}_metadata.json")
     
     # 1. Load Keras model with safe_mode=False to handle old model formats
+    import tensorflow as tf
     try:
         model = tf.keras.models.load_model(model_path, safe_mode=False)
     except TypeError:
@@ -144,17 +229,28 @@ def load_model_package(company, model_filename=None):
         'model_path': model_path
     }
 
-def get_company_models(company):
-    """Get list of all models for a company"""
+def load_model_packages(company, max_versions=None):
+    """
+    Load the retained versions of a company's model, most recent first
     
-    # Get the directory where THIS file (model_manager.py) is located
-    current_file_dir = os.path.dirname(__file__)
+    Args:
+        company: Stock ticker (primary identifier)
+        max_versions: Load at most this many versions (optional - all if None)
     
-    # Go up TWO levels to get to project root
-    project_root = os.path.dirname(os.path.dirname(current_file_dir))
+    Raises:
+        FileNotFoundError: No model exists for the company
+    """
+    company_dir = os.path.join(get_models_root(), company)
+    versions = _list_model_versions(company_dir) if os.path.exists(company_dir) else []
+    if not versions:
+        raise FileNotFoundError(f"No models found for company {company}")
+    return [load_model_package(company, base_filename) for base_filename in versions[:max_versions]]
+
+def get_company_models(company):
+    """Get list of all models for a company"""
     
-    # Now storage/models/COMPANY is the right path
-    company_dir = os.path.join(project_root, "storage/models", company)
+    # storage/models/COMPANY
+    company_dir = os.path.join(get_models_root(), company)
     
     print(f"Looking in: {company_dir}") 
     if not os.path.exists(company_dir):
@@ -162,9 +258,13 @@ def get_company_models(company):
         return []
     
     models = []
-    for filename in os.listdir(company_dir):
-        if filename.endswith('_metadata.json'):
-            metadata_path = os.path.join(company_dir, filename)
+    for base_filename in _list_model_versions(company_dir):
+        bundle_path = os.path.join(company_dir, f"{base_filename}{BUNDLE_EXTENSION}")
+        metadata_path = os.path.join(company_dir, f"{base_filename}_metadata.json")
+        if os.path.exists(bundle_path):
+            # Only the JSON header is read, not the weights
+            models.append(read_bundle_header(bundle_path)['metadata'])
+        elif os.path.exists(metadata_path):
             with open(metadata_path, 'r') as f:
                 metadata = json.load(f)
             models.append(metadata)
@@ -177,9 +277,7 @@ def delete_models(company: str):
     Delete model files for a company
     """
     # Get absolute path to company directory
-    current_file_dir = os.path.dirname(__file__)
-    project_root = os.path.dirname(os.path.dirname(current_file_dir))
-    company_dir = os.path.join(project_root, "storage/models", company)
+    company_dir = os.path.join(get_models_root(), company)
     
     print(f"DEBUG: Looking for company directory: {company_dir}")
     
@@ -198,6 +296,7 @@ def delete_models(company: str):
     # Remove the now-empty directory
     os.rmdir(company_dir)
     print(f"DEBUG: Removed directory: {company_dir}")
+    _publish_models_generation()
     
     return {
         "message": f"Deleted {len(deleted_files)} files for {company}",
@@ -207,16 +306,7 @@ def delete_models(company: str):
 def get_all_companies_with_models():
     """Get list of all companies that have trained models"""
     
-    # Get the directory where THIS file (model_manager.py) is located
-    current_file_dir = os.path.dirname(__file__)
-    # current_file_dir = /stock-prediction-api/app/model_ops
-    
-    # Go up TWO levels to get to project root
-    project_root = os.path.dirname(os.path.dirname(current_file_dir))
-    # project_root = /stock-prediction-api
-    
-    # Now storage/models is in the right place
-    models_dir = os.path.join(project_root, "storage/models")
+    models_dir = get_models_root()
     
     print(f"Looking in: {models_dir}") 
     
@@ -3,13 +3,23 @@ import json
 import os
 import numpy as np
 from datetime import datetime, timedelta
-import tensorflow as tf
-from data_pipeline.data_loader import load_data
+from data_pipeline.data_loader import load_recent_bars
+from model_ops.model_bundle import architecture_key, stacking_key, stack_models, pad_models
 
 
-def predict_future(model_package, days_ahead=1):
+def fetch_latest_prices(company, n_bars):
+    """Exactly the last n_bars closes as an array; never padded"""
+    try:
+        return load_recent_bars(company, n_bars).values
+    except Exception as e:
+        raise ValueError(f"Could not fetch latest data: {str(e)}")
+
+def predict_future(model_package, days_ahead=1, latest_prices=None):
     """
     Predict future stock prices using saved model
+
+    latest_prices (the last slicing_window closes) are fetched when not given;
+    the API fetches them itself so the inference pool only runs the forward pass.
     """
     model = model_package['model']
     scaler = model_package['scaler'] 
@@ -18,26 +28,9 @@ def predict_future(model_package, days_ahead=1):
     company = metadata['company']
     slicing_window = metadata['slicing_window']
     
-    try:
-        # Load more data than needed to ensure we have enough
-        # Add buffer for weekends/holidays (50% extra)
-        buffer_days = int(slicing_window * 1.5)
-        latest_data = load_data(company, f"{buffer_days}d")
-        latest_prices = latest_data.values
-        
-        # Take exactly the last slicing_window days
-        if len(latest_prices) >= slicing_window:
-            latest_prices = latest_prices[-slicing_window:]
-        else:
-            # If we still don't have enough data, use what we have
-            print(f"⚠️ Warning: Only {len(latest_prices)} days available, need {slicing_window}")
-            # Pad with the last available value if needed
-            if len(latest_prices) < slicing_window:
-                padding = np.full(slicing_window - len(latest_prices), latest_prices[-1])
-                latest_prices = np.concatenate([padding, latest_prices])
-                
-    except Exception as e:
-        raise ValueError(f"Could not fetch latest data: {str(e)}")
+    if latest_prices is None:
+        latest_prices = fetch_latest_prices(company, slicing_window)
+    latest_prices = np.asarray(latest_prices)[-slicing_window:]
     
     # Scale the data
     scaled_data = scaler.transform(latest_prices.reshape(-1, 1))
@@ -58,4 +51,107 @@ def predict_future(model_package, days_ahead=1):
         np.array(predictions).reshape(-1, 1)
     ).flatten()
     
-    return actual_predictions
\ No newline at end of file
+    return actual_predictions
+
+def stack_packages(model_packages, pad_widths=False):
+    """
+    Group model packages into batched models for predict_future_batch
+
+    Bundle models with the same architecture (and so the same slicing_window)
+    are stacked into one model; legacy Keras models each get their own group.
+    With pad_widths, models that only differ in their units are zero-padded
+    to a common width and stacked too.
+
+    Returns:
+        List of (package indices, model, stacked) tuples; stacked models take
+        inputs shaped (models, batch, slicing_window, 1)
+    """
+    groups = {}
+    for index, package in enumerate(model_packages):
+        key = stacking_key(package['model']) if pad_widths else architecture_key(package['model'])
+        # Legacy models each get their own group
+        groups.setdefault(key if key is not None else ('legacy', index), []).append(index)
+
+    stacks = []
+    for key, indices in groups.items():
+        if key[0] == 'legacy':
+            stacks.append((indices, model_packages[indices[0]]['model'], False))
+            continue
+        models = [model_packages[i]['model'] for i in indices]
+        if len({architecture_key(model) for model in models}) > 1:
+            models = pad_models(models)
+        stacks.append((indices, stack_models(models), True))
+    return stacks
+
+def predict_future_batch(model_packages, price_windows, days_ahead=1, pad_widths=False, stacks=None):
+    """
+    Roll out forecasts for many model packages at once
+
+    Each group of stack_packages runs as one batched forward pass per
+    forecast day.
+
+    Args:
+        model_packages: List of packages from load_model_package / the registry
+        price_windows: Matching list of the last slicing_window prices for each package
+        days_ahead: Number of days to forecast
+        pad_widths: Group by stacking_key instead of architecture_key
+        stacks: Result of stack_packages for these packages (built when not given)
+
+    Returns:
+        Array shaped (len(model_packages), days_ahead) of prices
+    """
+    results = np.zeros((len(model_packages), days_ahead))
+    if stacks is None:
+        stacks = stack_packages(model_packages, pad_widths)
+
+    for indices, model, stacked in stacks:
+        scalers = [model_packages[i]['scaler'] for i in indices]
+        mean = np.array([scaler.mean_[0] for scaler in scalers]).reshape(-1, 1)
+        scale = np.array([scaler.scale_[0] for scaler in scalers]).reshape(-1, 1)
+        windows = np.stack([np.asarray(price_windows[i], dtype=np.float64) for i in indices])
+        sequences = ((windows - mean) / scale).astype(np.float32)
+
+        if stacked:
+            step = model.predict
+        else:
+            step = lambda x: model.predict(x[0], verbose=0)[np.newaxis]
+
+        predictions = np.zeros((len(indices), days_ahead), dtype=np.float32)
+        for day in range(days_ahead):
+            # (models, batch=1, slicing_window, 1) -> (models, 1, 1)
+            next_pred_scaled = step(sequences[:, np.newaxis, :, np.newaxis])[:, 0, 0]
+            predictions[:, day] = next_pred_scaled
+            sequences = np.concatenate([sequences[:, 1:], next_pred_scaled[:, np.newaxis]], axis=1)
+
+        results[indices] = predictions * scale + mean
+
+    return results
+
+def ensemble_window(model_packages):
+    """Number of closes predict_ensemble needs (the longest slicing_window)"""
+    return max(package['metadata']['slicing_window'] for package in model_packages)
+
+def predict_ensemble(model_packages, days_ahead=1, latest_prices=None, stacks=None):
+    """
+    Forecast with several versions of one company's model at once
+
+    Prices are fetched once (for the longest slicing_window) and all versions
+    are rolled out together by predict_future_batch.
+
+    Args:
+        model_packages: Versions of the same company's model
+        days_ahead: Number of days to forecast
+        latest_prices: The last ensemble_window() closes (fetched when not given)
+        stacks: stack_packages(model_packages, pad_widths=True) (built when not given)
+
+    Returns:
+        Tuple (mean, spread) of arrays of days_ahead prices; spread is the
+        standard deviation across versions
+    """
+    if latest_prices is None:
+        latest_prices = fetch_latest_prices(model_packages[0]['metadata']['company'], ensemble_window(model_packages))
+    
+    windows = [latest_prices[-package['metadata']['slicing_window']:] for package in model_packages]
+    # Retrains usually tune different units: pad them so each slicing_window is one pass
+    forecasts = predict_future_batch(model_packages, windows, days_ahead, pad_widths=True, stacks=stacks)
+    return forecasts.mean(axis=0), forecasts.std(axis=0)
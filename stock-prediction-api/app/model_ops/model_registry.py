@@ -0,0 +1,174 @@
+"""
+In-process cache of loaded model packages.
+
+Packages stay cached until storage/models publishes a new generation
+(save_model_package / delete_models). Bundle weights are memory-mapped, so a
+pre-fork master can preload them once and every forked worker reads the same
+physical pages.
+"""
+import os
+import threading
+from model_ops.model_manager import (
+    load_model_package, load_model_packages, get_all_companies_with_models, get_models_generation,
+    get_models_root, _list_model_versions
+)
+from model_ops.model_bundle import BUNDLE_EXTENSION
+
+_lock = threading.Lock()
+_packages = {}
+# company -> every retained version, for ensemble predictions
+_versions = {}
+# company -> those versions padded and stacked (model_predictor.stack_packages)
+_stacks = {}
+_generation = None
+
+
+def _check_generation():
+    """Drop every cached package if storage/models changed since it was loaded"""
+    global _generation
+    generation = get_models_generation()
+    if generation != _generation:
+        if _packages or _versions:
+            print(f"Model storage changed (generation {generation}), clearing {len(_packages)} cached models")
+        _packages.clear()
+        _versions.clear()
+        _stacks.clear()
+        _generation = generation
+
+
+def _load_cached(cache, company, load):
+    """
+    cache[company], loading it without holding the lock on a miss
+
+    Concurrent misses may load the same company twice; the first insert wins
+    so every caller shares one object. Results loaded while storage/models
+    changed are returned but not cached.
+    """
+    with _lock:
+        _check_generation()
+        value = cache.get(company)
+        generation = _generation
+    if value is not None:
+        return value
+
+    # A slow load (or a legacy .keras load importing TensorFlow) never blocks other companies
+    value = load(company)
+    with _lock:
+        _check_generation()
+        if _generation == generation:
+            value = cache.setdefault(company, value)
+    return value
+
+
+def get_model_package(company):
+    """
+    Latest model package for a company, loaded once per storage generation
+
+    Raises:
+        FileNotFoundError: No model exists for the company
+    """
+    return _load_cached(_packages, company, load_model_package)
+
+
+def get_model_packages(company):
+    """
+    Every retained version of a company's model (most recent first), loaded once per storage generation
+
+    Raises:
+        FileNotFoundError: No model exists for the company
+    """
+    return _load_cached(_versions, company, load_model_packages)
+
+
+def get_ensemble(company):
+    """
+    Retained versions of a company's model with their stacked models for
+    predict_ensemble, padded and stacked once per storage generation
+
+    Returns:
+        Tuple (packages, stacks)
+
+    Raises:
+        FileNotFoundError: No model exists for the company
+    """
+    from model_ops.model_predictor import stack_packages
+
+    packages = get_model_packages(company)
+    with _lock:
+        _check_generation()
+        stacks = _stacks.get(company)
+        generation = _generation
+    if stacks is not None and stacks[0] is packages:
+        return stacks
+
+    # Padding copies every version's weights: build outside the lock, publish for this generation only
+    stacks = (packages, stack_packages(packages, pad_widths=True))
+    with _lock:
+        _check_generation()
+        if _generation == generation and _versions.get(company) is packages:
+            _stacks[company] = stacks
+    return stacks
+
+
+def preload_models(companies=None):
+    """
+    Load the latest bundle of each company into the cache
+
+    Legacy .keras packages are skipped so the caller never imports TensorFlow;
+    convert them with model_ops/model_bundle.py to make them preloadable.
+
+    Returns:
+        List of companies that were loaded
+    """
+    companies = companies or get_all_companies_with_models()
+    with _lock:
+        _check_generation()
+        generation = _generation
+        cached = set(_packages)
+
+    # Scan and load without the lock, so requests for cached models never wait on a preload
+    loaded, packages = [], {}
+    for company in companies:
+        company_dir = os.path.join(get_models_root(), company)
+        if not os.path.isdir(company_dir):
+            continue
+        versions = _list_model_versions(company_dir)
+        if not versions:
+            continue
+        if not os.path.exists(os.path.join(company_dir, f"{versions[0]}{BUNDLE_EXTENSION}")):
+            print(f"Skipping preload of {company}: latest model is not a bundle")
+            continue
+        if company not in cached:
+            packages[company] = load_model_package(company)
+        loaded.append(company)
+
+    with _lock:
+        _check_generation()
+        if _generation != generation:
+            # A model was published meanwhile and the cache was cleared: load on demand instead
+            return []
+        for company, package in packages.items():
+            _packages.setdefault(company, package)
+    return loaded
+
+
+def cached_companies():
+    """Companies currently held in the cache"""
+    with _lock:
+        return sorted(set(_packages) | set(_versions))
+
+
+def evict_models(companies):
+    """
+    Drop companies from the cache (e.g. models that moved to another shard)
+
+    Returns:
+        List of companies that were cached and are now evicted
+    """
+    with _lock:
+        evicted = [company for company in companies if company in _packages or company in _versions]
+        for company in evicted:
+            _packages.pop(company, None)
+            _versions.pop(company, None)
+            _stacks.pop(company, None)
+        return evicted
@@ -0,0 +1,135 @@
+"""
+Post-training int8 quantization of model bundles.
+
+Kernels are quantized symmetrically per output channel (one float32 scale
+per column, q = round(w / scale) with |q| <= 127); biases stay float32. The
+int8 tensors and their scales are written into the same .snxb bundle as the
+float weights. The bundle header records which variant serves, so loading a
+model only touches (and keeps resident) the pages of that variant.
+
+The int8 variant is selected for a model when its one-step backtest MAE on
+the most recent windows of the training series stays within
+QUANTIZATION_MAX_DELTA (relative, default 0.02 = 2%) of the float model's.
+
+Environment:
+    MODEL_QUANTIZATION             'auto' (default) or 'off' (neither write nor serve int8)
+    QUANTIZATION_MAX_DELTA         allowed relative MAE increase of the int8 variant (default 0.02)
+    QUANTIZATION_BACKTEST_WINDOWS  most recent windows used for the backtest (default 250)
+"""
+import os
+import numpy as np
+
+QUANTIZATION_SCHEME = "int8_per_channel"
+INT8_SUFFIX = ".int8"
+SCALE_SUFFIX = ".scale"
+# Kernels are (inputs, outputs) matrices: one scale per output column
+_QUANTIZED_WEIGHTS = ('kernel', 'recurrent_kernel')
+
+
+def quantization_enabled():
+    mode = os.environ.get('MODEL_QUANTIZATION', 'auto')
+    if mode not in ('auto', 'off'):
+        raise ValueError(f"Unknown MODEL_QUANTIZATION: {mode}")
+    return mode == 'auto'
+
+
+def get_max_delta():
+    return float(os.environ.get('QUANTIZATION_MAX_DELTA', 0.02))
+
+
+def quantize_per_channel(weight):
+    """
+    Symmetric int8 quantization with one scale per output channel (last axis)
+
+    Returns:
+        Tuple (int8 array, float32 scales)
+    """
+    weight = np.asarray(weight, dtype=np.float32)
+    max_abs = np.abs(weight).max(axis=tuple(range(weight.ndim - 1)))
+    # An all-zero channel keeps scale 1 so it dequantizes back to zeros
+    scale = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    quantized = np.clip(np.rint(weight / scale), -127, 127).astype(np.int8)
+    return quantized, scale
+
+
+def quantize_tensors(layers, tensors):
+    """
+    Int8 variants of every kernel referenced by the layer specs
+
+    Returns:
+        Tuple (extra tensors to store, map float name -> [int8 name, scale name])
+    """
+    extra, mapping = {}, {}
+    for spec in layers:
+        for name in spec['weights']:
+            if name.rsplit('/', 1)[-1] not in _QUANTIZED_WEIGHTS:
+                continue
+            quantized, scale = quantize_per_channel(tensors[name])
+            extra[name + INT8_SUFFIX] = quantized
+            extra[name + SCALE_SUFFIX] = scale
+            mapping[name] = [name + INT8_SUFFIX, name + SCALE_SUFFIX]
+    return extra, mapping
+
+
+def backtest_mae(model, data, scaler, slicing_window, n_windows):
+    """One-step-ahead mean absolute error in price units over the last n_windows windows"""
+    values = np.asarray(getattr(data, 'values', data)).reshape(-1)
+    n_windows = min(n_windows, len(values) - slicing_window)
+    if n_windows < 1:
+        raise ValueError(f"Need more than {slicing_window} points to backtest, got {len(values)}")
+    # Only the tail is read, so a memory-mapped series is never loaded whole
+    prices = np.asarray(values[-(slicing_window + n_windows):], dtype=np.float64).reshape(-1, 1)
+    scaled = scaler.transform(prices)[:, 0].astype(np.float32)
+    starts = np.arange(n_windows)
+    X = np.stack([scaled[start:start + slicing_window] for start in starts])[..., np.newaxis]
+    predicted = scaler.inverse_transform(np.asarray(model.predict(X), dtype=np.float64).reshape(-1, 1))[:, 0]
+    return float(np.mean(np.abs(predicted - prices[starts + slicing_window, 0])))
+
+
+def quantize_model(model, scaler, data, slicing_window):
+    """
+    Build the int8 variant of a trained Keras model and decide whether it serves
+
+    Args:
+        model: Trained Keras model
+        scaler: Scaler fitted on the training series
+        data: Training price series or PriceSeries (the backtest uses its most recent windows)
+        slicing_window: Model input length
+
+    Returns:
+        Dictionary for save_model_package(quantization=...), or None when
+        MODEL_QUANTIZATION is 'off'
+    """
+    from model_ops.model_bundle import BundleModel, extract_layers
+
+    if not quantization_enabled():
+        return None
+    layers, tensors = extract_layers(model)
+    extra, mapping = quantize_tensors(layers, tensors)
+    input_shape = model.input_shape[1:]
+    float_model = BundleModel(layers, tensors, input_shape)
+    int8_model = BundleModel(layers, dict(tensors, **{name: extra[q] for name, (q, _) in mapping.items()}),
+                             input_shape, scales={name: extra[s] for name, (_, s) in mapping.items()})
+
+    n_windows = int(os.environ.get('QUANTIZATION_BACKTEST_WINDOWS', 250))
+    float_mae = backtest_mae(float_model, data, scaler, slicing_window, n_windows)
+    int8_mae = backtest_mae(int8_model, data, scaler, slicing_window, n_windows)
+    max_delta = get_max_delta()
+    relative_delta = (int8_mae - float_mae) / float_mae if float_mae > 0 else 0.0
+    float_bytes = sum(tensors[name].nbytes for name in mapping)
+    int8_bytes = sum(extra[q].nbytes + extra[s].nbytes for q, s in mapping.values())
+    return {
+        'tensors': extra,
+        'mapping': mapping,
+        'report': {
+            'scheme': QUANTIZATION_SCHEME,
+            'selected': bool(relative_delta <= max_delta),
+            'float_backtest_mae': round(float_mae, 6),
+            'int8_backtest_mae': round(int8_mae, 6),
+            'relative_delta': round(relative_delta, 6),
+            'max_delta': max_delta,
+            'backtest_windows': min(n_windows, len(data) - slicing_window),
+            'kernel_bytes_float32': int(float_bytes),
+            'kernel_bytes_int8': int(int8_bytes),
+        },
+    }
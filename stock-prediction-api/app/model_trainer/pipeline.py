@@ -0,0 +1,192 @@
+"""
+Complete training pipeline behind /api/train: load data, tune, train,
+quantize, save, verify and predict.
+
+It runs in the training worker processes (see serving/workloads.py), so
+TensorFlow and its thread pools stay out of the API process, and each job's
+runtime profile (oneDNN included) applies to a fresh TensorFlow.
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+from data_pipeline.price_series import load_price_series
+from model_ops.model_manager import save_model_package, load_model_package
+from model_ops.model_predictor import predict_future
+from model_ops.quantization import quantize_model
+from runtime_profile.profiles import get_runtime_profile
+
+
+def run_training_pipeline(company, lookback_period="50mo", n_trials=20, days_ahead=10, runtime_profile=None,
+                          final_training="budget", search_mode="hyperband", selection=None):
+    """
+    Train a new model for a company and predict immediately
+
+    Args mirror TrainRequest.
+
+    Returns:
+        Dictionary with the TrainResponse fields
+    """
+    print("Starting COMPLETE TRAINING PIPELINE")
+    print("=" * 50)
+    print(f"Company: {company}")
+    print(f"Lookback: {lookback_period}")
+    print(f"Trials: {n_trials} ({search_mode})")
+    print(f"Predict Days: {days_ahead}")
+    profile = get_runtime_profile(runtime_profile)
+    print(f"Runtime profile: {profile['name']} (batch {profile['batch_size']}, "
+          f"XLA {profile['jit_compile']}, {profile['precision']})")
+    print("=" * 50)
+    
+    # Each job gets a fresh training process, so the job's oneDNN setting can still be
+    # exported before the tuner imports TensorFlow (it reads RUNTIME_ONEDNN at import)
+    if 'tensorflow' not in sys.modules:
+        os.environ['RUNTIME_ONEDNN'] = '1' if profile['onednn'] else '0'
+    from hyperparameter_tuner.tuner import optimize_hyperparameters
+    from model_trainer.trainer import train_final_model
+    
+    start_time = time.time()
+    
+    # Best trial weights are only kept for the duration of the request
+    checkpoint_dir = tempfile.mkdtemp(prefix="tuning_") if final_training == "warm_start" else None
+    checkpoint_path = os.path.join(checkpoint_dir, "best_trial.h5") if checkpoint_dir else None
+    data = None
+    
+    try:
+        # 1. DATA LOADING
+        print("\nPHASE 1: Loading Data...")
+        data_load_start = time.time()
+        # Streamed in chunks into a float32 memmap (data_pipeline/price_series.py)
+        data = load_price_series(company, lookback_period)
+        data_load_time = time.time() - data_load_start
+        
+        print(f"Loaded {len(data)} data points for {company}")
+        print(f"Date range: {data.start.strftime('%Y-%m-%d')} to {data.end.strftime('%Y-%m-%d')}")
+        print(f"Price range: ${data.min:.2f} - ${data.max:.2f}")
+        print(f"Data loading time: {data_load_time:.2f}s")
+        
+        # 2. HYPERPARAMETER OPTIMIZATION
+        print("\nPHASE 2: Hyperparameter Optimization...")
+        tuning_start = time.time()
+        tuning_report = {}
+        best_hyperparams = optimize_hyperparameters(
+            data, n_trials=n_trials, profile=profile, checkpoint_path=checkpoint_path,
+            search_mode=search_mode, search_report=tuning_report, selection=selection
+        )
+        tuning_time = time.time() - tuning_start
+        
+        print(f"Best hyperparameters found:")
+        for param, value in best_hyperparams.items():
+            print(f"   - {param}: {value}")
+        print(f"Tuning time: {tuning_time:.2f}s")
+        
+        # 3. FINAL MODEL TRAINING
+        print("\nPHASE 3: Final Model Training...")
+        training_start = time.time()
+        model, history, scaler = train_final_model(
+            data, best_hyperparams, profile=profile, warm_start_weights=checkpoint_path
+        )
+        training_time = time.time() - training_start
+        
+        final_train_loss = history['loss'][-1] if history['loss'] else 'N/A'
+        final_val_loss = history['val_loss'][-1] if history['val_loss'] else 'N/A'
+        
+        print(f"Model trained successfully")
+        print(f"Final training loss: {final_train_loss:.4f}")
+        print(f"Final validation loss: {final_val_loss:.4f}")
+        print(f"Training time: {training_time:.2f}s")
+        
+        # 4. POST-TRAINING QUANTIZATION
+        print("\nPHASE 4: Quantizing Model...")
+        quantization_start = time.time()
+        quantization = quantize_model(model, scaler, data, best_hyperparams['slicing_window'])
+        quantization_report = quantization['report'] if quantization else None
+        if quantization_report:
+            print(f"Backtest MAE: float32 {quantization_report['float_backtest_mae']:.4f}, "
+                  f"int8 {quantization_report['int8_backtest_mae']:.4f} "
+                  f"({quantization_report['relative_delta']:+.2%}, limit {quantization_report['max_delta']:.0%})")
+            print(f"Serving precision: {'int8' if quantization_report['selected'] else 'float32'}")
+        else:
+            print("Quantization disabled (MODEL_QUANTIZATION=off)")
+        print(f"Quantization time: {time.time() - quantization_start:.2f}s")
+        
+        # 5. MODEL SAVING
+        print("\nPHASE 5: Saving Model Package...")
+        saving_start = time.time()
+        save_paths = save_model_package(
+            model=model, 
+            scaler=scaler, 
+            best_params=best_hyperparams, 
+            training_history=history, 
+            company=company, 
+            lookback_period=lookback_period,
+            quantization=quantization
+        )
+        saving_time = time.time() - saving_start
+        
+        print(f"Model package saved:")
+        for key, path in save_paths.items():
+            print(f"   - {key}: {os.path.basename(path)}")
+        print(f"Saving time: {saving_time:.2f}s")
+        
+        # 6. VERIFICATION LOAD
+        print("\nPHASE 6: Verifying Saved Model...")
+        verify_start = time.time()
+        loaded_package = load_model_package(company)
+        verify_time = time.time() - verify_start
+        
+        print(f"Model loaded successfully for verification")
+        print(f"Metadata: {loaded_package['metadata']['company']} trained on {loaded_package['metadata']['training_date']}")
+        print(f"Verification time: {verify_time:.2f}s")
+        
+        # 7. GENERATE PREDICTIONS
+        print("\nPHASE 7: Generating Predictions...")
+        predict_start = time.time()
+        
+        predictions = predict_future(
+            model_package=loaded_package,
+            days_ahead=days_ahead
+        )
+        
+        predict_time = time.time() - predict_start
+        
+        print(f"Generated {len(predictions)} predictions")
+        print(f"Prediction range: ${predictions.min():.2f} - ${predictions.max():.2f}")
+        print(f"Prediction time: {predict_time:.2f}s")
+        
+        # 8. FINAL SUMMARY
+        total_time = time.time() - start_time
+        print("\nTRAINING PIPELINE COMPLETED SUCCESSFULLY!")
+        print("=" * 50)
+        print(f"Total pipeline time: {total_time:.2f}s")
+        print(f"Data points processed: {len(data)}")
+        print(f"Hyperparameters optimized: {len(best_hyperparams)}")
+        print(f"Predictions generated: {len(predictions)} days")
+        print(f"Model saved to: {save_paths['model_path']}")
+        print("=" * 50)
+        
+        # Format the response
+        return dict(
+            company=company,
+            lookback_period=lookback_period,
+            training_date=loaded_package['metadata']['training_date'],
+            training_time_seconds=total_time,
+            hyperparameters=best_hyperparams,
+            performance={
+                'final_train_loss': final_train_loss,
+                'final_val_loss': final_val_loss
+            },
+            predictions=predictions.tolist() if hasattr(predictions, 'tolist') else predictions,
+            tuning_report=tuning_report,
+            quantization=quantization_report,
+        )
+        
+    except Exception as e:
+        print(f"\nTRAINING PIPELINE FAILED: {str(e)}")
+        raise
+    finally:
+        if data is not None:
+            data.close()
+        if checkpoint_dir:
+            shutil.rmtree(checkpoint_dir, ignore_errors=True)
@@ -1,6 +1,11 @@
-from sklearn.preprocessing import StandardScaler
-from tensorflow import keras
 import numpy as np
+import math
+import os
+from hyperparameter_tuner.tuner import build_model, read_checkpoint_scaler, FINAL_VALIDATION_SPLIT
+from hyperparameter_tuner.data_context import make_windows
+from hyperparameter_tuner.window_feed import fit_inputs
+from data_pipeline.price_series import PriceSeries, partial_fit_scaler, scale_into, allocate_series
+from runtime_profile.profiles import get_runtime_profile, configure_tensorflow
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -15,79 +20,63 @@ best_hyperparameters = {
 
 """
 
+# A warm-started model only fine-tunes for this fraction of the epoch budget
+WARM_START_EPOCH_FRACTION = 0.25
 
-def train_final_model(data, best_hyperparameters):
+
+def train_final_model(data, best_hyperparameters, profile=None, warm_start_weights=None):
     """
     Final training after hyperparameter tuning
-    Uses 100% of available data for maximum learning
-    """
-    # Prepare data - use 100% for final model
-    dataset = data.values
-
-    # Use ALL data for final training (no split)
-    training_data = dataset  # 100% of data
-
-    # Reshape to 2D array (required by MinMaxScaler)
-    training_data_2d = training_data.reshape(-1, 1)
+    Uses the whole series; the most recent FINAL_VALIDATION_SPLIT of the
+    windows is held out for validation
 
-    # Scale the training data
-    scaler = StandardScaler()
-    scaled_data = scaler.fit_transform(training_data_2d)
-
-    # SLICING WINDOW PART:
-    X_train, y_train = [], []
-
-    # Use best hyperparameter
+    If warm_start_weights points to the best trial's checkpoint (see
+    optimize_hyperparameters), training starts from those weights and only
+    fine-tunes on the full dataset, scaled with the tuning scaler stored in
+    the checkpoint (the returned scaler is then that one).
+    """
+    if profile is None:
+        profile = get_runtime_profile()
+    configure_tensorflow(profile)
+
+    # The whole series is scaled and windowed. A PriceSeries stays memory-mapped
+    # and its scaled copy goes to the same scratch directory; statistics are
+    # accumulated chunk by chunk, so no float64 copy of the series is made
+    if isinstance(data, PriceSeries):
+        dataset, scratch_dir = data.values, data.directory
+    else:
+        dataset, scratch_dir = np.asarray(getattr(data, 'values', data)).reshape(-1), None
+
+    # Scale the training data. Warm-start weights were learned on inputs scaled
+    # with the tuning scaler (train split only), so keep scaling with it then
+    warm_start = bool(warm_start_weights and os.path.exists(warm_start_weights))
+    scaler = read_checkpoint_scaler(warm_start_weights) if warm_start else None
+    if scaler is None:
+        scaler = partial_fit_scaler(dataset)
+    scaled_data = scale_into(scaler, dataset, allocate_series(len(dataset), scratch_dir))
+
+    # SLICING WINDOW PART: float32 views over the scaled series, no copies
     slicing_window = best_hyperparameters['slicing_window']
+    X, y = make_windows(scaled_data, slicing_window)
 
-    # Create sequences from ENTIRE dataset
-    for i in range(slicing_window, len(training_data)):
-        # Get the past slicing_window days as features (X)
-        X_train.append(scaled_data[i - slicing_window:i, 0]) 
-        # Get the next day as target (y)
-        y_train.append(scaled_data[i, 0])  
+    # Hold out the most recent windows for validation (as validation_split does)
+    split_at = int(len(X) * (1 - FINAL_VALIDATION_SPLIT))
+    X_train, y_train, X_val, y_val = X[:split_at], y[:split_at], X[split_at:], y[split_at:]
 
-    X_train, y_train = np.array(X_train), np.array(y_train)
-    X_train = np.reshape(X_train, (X_train.shape[0], X_train.shape[1], 1))
+    # Build the model with best hyperparameters (same architecture as the tuning trials)
+    model = build_model(best_hyperparameters, X_train.shape[1], profile)
 
-    # Build the model with best hyperparameters
-    model = keras.models.Sequential()
-
-    # First Layer - USE BEST HYPERPARAMETER
-    model.add(keras.layers.LSTM(
-        best_hyperparameters['LSTM_units'], 
-        return_sequences=True, 
-        input_shape=(X_train.shape[1], 1)
-    ))
-
-    # Second Layer - USE BEST HYPERPARAMETER
-    model.add(keras.layers.LSTM(
-        best_hyperparameters['LSTM_units'], 
-        return_sequences=False
-    ))
-                                
-    # 3rd Layer (Dense)
-    model.add(keras.layers.Dense(128, activation="relu"))
-
-    # 4th Layer (Dropout) - USE BEST HYPERPARAMETER
-    model.add(keras.layers.Dropout(best_hyperparameters['dropout_rate']))
-
-    # Final output layer
-    model.add(keras.layers.Dense(1))
-
-    model.compile(
-        optimizer=keras.optimizers.Adam(learning_rate=0.001),
-        loss="mae",
-        metrics=[keras.metrics.RootMeanSquaredError()]
-    )
+    epochs = best_hyperparameters['epochs']
+    if warm_start:
+        print(f"Warm-starting from best trial weights: {warm_start_weights}")
+        model.load_weights(warm_start_weights)
+        epochs = max(1, math.ceil(epochs * WARM_START_EPOCH_FRACTION))
 
     # FINAL TRAINING
     history = model.fit(
-        X_train, y_train,
-        epochs=best_hyperparameters['epochs'],
-        batch_size=32,
-        validation_split=0.1
+        **fit_inputs(X_train, y_train, X_val, y_val, profile['batch_size']),
+        epochs=epochs
     )
 
-    # Return the final model trained on 100% data
+    # Return the final model (trained on all but the held-out validation tail)
     return model, history.history, scaler
\ No newline at end of file
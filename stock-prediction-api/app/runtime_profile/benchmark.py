@@ -0,0 +1,137 @@
+"""
+Benchmark the runtime profiles on this host and keep the fastest one.
+
+Each profile runs in a fresh interpreter because oneDNN and the TF thread
+pools are fixed for the lifetime of a process. The winner is written to
+storage/runtime_profile.json and becomes the deployment default whenever
+RUNTIME_PROFILE is not set.
+
+Usage (from stock-prediction-api/):
+    python app/runtime_profile/benchmark.py
+    python app/runtime_profile/benchmark.py --profiles default throughput --epochs 5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from runtime_profile.profiles import RUNTIME_PROFILES, get_runtime_profile, get_benchmark_path
+
+# Representative of a tuned model: ~4 years of daily bars, mid-sized window
+BENCHMARK_PARAMS = {
+    'slicing_window': 40,
+    'LSTM_units': 64,
+    'dropout_rate': 0.2,
+}
+BENCHMARK_POINTS = 1000
+
+
+def run_worker(profile_name, epochs):
+    """Time training and inference for one profile inside this process"""
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+    os.environ['RUNTIME_PROFILE'] = profile_name
+    import numpy as np
+    from hyperparameter_tuner.tuner import build_model, create_sequences
+    from runtime_profile.profiles import configure_tensorflow
+
+    profile = get_runtime_profile(profile_name)
+    configure_tensorflow(profile)
+
+    rng = np.random.default_rng(0)
+    series = np.cumsum(rng.normal(0, 1, BENCHMARK_POINTS)).reshape(-1, 1)
+    series = (series - series.mean()) / series.std()
+    X, y = create_sequences(series, BENCHMARK_PARAMS['slicing_window'])
+
+    model = build_model(BENCHMARK_PARAMS, X.shape[1], profile)
+
+    # First epoch pays for graph tracing / XLA compilation
+    warmup_start = time.time()
+    model.fit(X, y, epochs=1, batch_size=profile['batch_size'], verbose=0)
+    warmup_time = time.time() - warmup_start
+
+    fit_start = time.time()
+    model.fit(X, y, epochs=epochs, batch_size=profile['batch_size'], verbose=0)
+    fit_time = time.time() - fit_start
+
+    window = X[-1:]
+    model.predict(window, verbose=0)
+    predict_start = time.time()
+    for _ in range(20):
+        model.predict(window, verbose=0)
+    predict_time = (time.time() - predict_start) / 20
+
+    return {
+        'profile': profile_name,
+        'settings': {k: v for k, v in profile.items() if k != 'name'},
+        'warmup_seconds': warmup_time,
+        'train_samples_per_second': len(X) * epochs / fit_time,
+        'predict_latency_ms': predict_time * 1000,
+    }
+
+
+def run_benchmark(profile_names=None, epochs=3, save=True):
+    """
+    Benchmark each profile in its own subprocess
+
+    Returns:
+        Dictionary with the chosen profile, its settings and all results
+    """
+    profile_names = profile_names or list(RUNTIME_PROFILES)
+    results = []
+
+    for name in profile_names:
+        print(f"Benchmarking runtime profile '{name}'...")
+        env = dict(os.environ)
+        env.pop('RUNTIME_PROFILE', None)
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', name, '--epochs', str(epochs)],
+            env=env, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print(f"   - failed: {proc.stderr.strip().splitlines()[-1:]}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"   - {result['train_samples_per_second']:.0f} samples/s, "
+              f"predict {result['predict_latency_ms']:.1f} ms")
+        results.append(result)
+
+    if not results:
+        raise RuntimeError("No runtime profile completed the benchmark")
+
+    best = max(results, key=lambda r: r['train_samples_per_second'])
+    summary = {
+        'profile': best['profile'],
+        'settings': best['settings'],
+        'benchmarked_at': time.strftime("%Y%m%d_%H%M%S"),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+
+    if save:
+        path = get_benchmark_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Saved fastest profile '{best['profile']}' to {path}")
+
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pick the fastest runtime profile for this host")
+    parser.add_argument('--profiles', nargs='+', choices=sorted(RUNTIME_PROFILES))
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--no-save', action='store_true')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.epochs)))
+    else:
+        summary = run_benchmark(args.profiles, epochs=args.epochs, save=not args.no_save)
+        print(json.dumps({r['profile']: r['train_samples_per_second'] for r in summary['results']}, indent=2))
@@ -0,0 +1,194 @@
+"""
+Runtime performance profiles for TensorFlow training and inference.
+
+A profile is a plain dict with the following knobs:
+
+    onednn            - enable oneDNN kernels (TF_ENABLE_ONEDNN_OPTS, read at TF import)
+    intra_op_threads  - threads used inside a single op (0 = TensorFlow default)
+    inter_op_threads  - ops run concurrently (0 = TensorFlow default)
+    jit_compile       - compile the model with XLA (model.compile(jit_compile=...))
+    batch_size        - batch size used by every model.fit() call
+    precision         - keras global dtype policy: float32, mixed_float16 or mixed_bfloat16
+
+Resolution order (later wins):
+    1. RUNTIME_PROFILES[name]      name = argument, RUNTIME_PROFILE env var,
+                                   benchmarked host profile, or 'default'
+    2. RUNTIME_* environment variables (per deployment)
+    3. overrides dict (per job)
+"""
+import os
+import sys
+import json
+
+_CPU_COUNT = os.cpu_count() or 1
+
+RUNTIME_PROFILES = {
+    # Matches the historical behaviour: oneDNN off, TF picks threads, batch 32
+    'default': {
+        'onednn': False,
+        'intra_op_threads': 0,
+        'inter_op_threads': 0,
+        'jit_compile': False,
+        'batch_size': 32,
+        'precision': 'float32',
+    },
+    # Bare-metal training nodes: every core on one fit, larger batches, XLA
+    'throughput': {
+        'onednn': True,
+        'intra_op_threads': _CPU_COUNT,
+        'inter_op_threads': 2,
+        'jit_compile': True,
+        'batch_size': 64,
+        'precision': 'float32',
+    },
+    # CPUs with AVX512_BF16 / AMX run bfloat16 matmuls through oneDNN
+    'bfloat16': {
+        'onednn': True,
+        'intra_op_threads': _CPU_COUNT,
+        'inter_op_threads': 2,
+        'jit_compile': False,
+        'batch_size': 64,
+        'precision': 'mixed_bfloat16',
+    },
+    # Shared API hosts: keep TF off most cores so requests stay responsive
+    'low_latency': {
+        'onednn': True,
+        'intra_op_threads': min(2, _CPU_COUNT),
+        'inter_op_threads': 1,
+        'jit_compile': False,
+        'batch_size': 32,
+        'precision': 'float32',
+    },
+}
+
+PRECISIONS = ('float32', 'mixed_float16', 'mixed_bfloat16')
+
+_ENV_OVERRIDES = {
+    'onednn': ('RUNTIME_ONEDNN', 'bool'),
+    'intra_op_threads': ('RUNTIME_INTRA_OP_THREADS', 'int'),
+    'inter_op_threads': ('RUNTIME_INTER_OP_THREADS', 'int'),
+    'jit_compile': ('RUNTIME_JIT_COMPILE', 'bool'),
+    'batch_size': ('RUNTIME_BATCH_SIZE', 'int'),
+    'precision': ('RUNTIME_PRECISION', 'str'),
+}
+
+# Threading can only be configured once per process, before TF runs any op
+_applied_threads = None
+
+
+def get_benchmark_path():
+    """Location of the profile chosen by runtime_profile.benchmark for this host"""
+    current_file_dir = os.path.dirname(__file__)
+    project_root = os.path.dirname(os.path.dirname(current_file_dir))
+    return os.path.join(project_root, "storage", "runtime_profile.json")
+
+
+def _load_benchmarked_profile():
+    path = get_benchmark_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not read benchmarked runtime profile {path}: {e}")
+        return None
+
+
+def _parse_env(value, kind):
+    if kind == 'bool':
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    if kind == 'int':
+        return int(value)
+    return value.strip()
+
+
+def get_runtime_profile(name=None, overrides=None):
+    """
+    Resolve the effective runtime profile
+
+    Args:
+        name: Profile name from RUNTIME_PROFILES (optional - deployment default if None)
+        overrides: Dictionary of per-job settings applied last (optional)
+
+    Returns:
+        Dictionary with every knob set, plus the resolved 'name'
+    """
+    name = name or os.environ.get('RUNTIME_PROFILE')
+    profile = None
+
+    if name is None:
+        benchmarked = _load_benchmarked_profile()
+        if benchmarked is not None:
+            name = benchmarked['profile']
+            profile = dict(RUNTIME_PROFILES['default'])
+            profile.update(benchmarked['settings'])
+
+    if profile is None:
+        name = name or 'default'
+        if name not in RUNTIME_PROFILES:
+            raise ValueError(
+                f"Unknown runtime profile '{name}'. Available: {sorted(RUNTIME_PROFILES)}"
+            )
+        profile = dict(RUNTIME_PROFILES[name])
+
+    for key, (env_var, kind) in _ENV_OVERRIDES.items():
+        if env_var in os.environ:
+            profile[key] = _parse_env(os.environ[env_var], kind)
+
+    if overrides:
+        unknown = set(overrides) - set(RUNTIME_PROFILES['default'])
+        if unknown:
+            raise ValueError(f"Unknown runtime settings: {sorted(unknown)}")
+        profile.update(overrides)
+
+    if profile['precision'] not in PRECISIONS:
+        raise ValueError(f"precision must be one of {PRECISIONS}, got '{profile['precision']}'")
+    if profile['batch_size'] < 1:
+        raise ValueError("batch_size must be at least 1")
+
+    profile['name'] = name
+    return profile
+
+
+def apply_environment(profile):
+    """
+    Export the settings TensorFlow only reads at import time
+
+    Must run before the first `import tensorflow` in the process.
+    """
+    value = '1' if profile['onednn'] else '0'
+    if 'tensorflow' in sys.modules and os.environ.get('TF_ENABLE_ONEDNN_OPTS') != value:
+        print(f"Runtime profile '{profile['name']}': TensorFlow already imported, "
+              f"oneDNN setting ignored for this process")
+        return
+    os.environ['TF_ENABLE_ONEDNN_OPTS'] = value
+
+
+def configure_tensorflow(profile):
+    """
+    Apply the thread pool and dtype policy settings of a profile
+
+    Thread pools are fixed once TensorFlow has initialized, so only the first
+    profile applied in a process controls them; later jobs keep those pools.
+    """
+    global _applied_threads
+    import tensorflow as tf
+
+    threads = (profile['intra_op_threads'], profile['inter_op_threads'])
+    if _applied_threads is None:
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(threads[0])
+            tf.config.threading.set_inter_op_parallelism_threads(threads[1])
+        except RuntimeError:
+            # TensorFlow already ran an op in this process
+            pass
+        _applied_threads = (
+            tf.config.threading.get_intra_op_parallelism_threads(),
+            tf.config.threading.get_inter_op_parallelism_threads(),
+        )
+    if threads != _applied_threads and threads != (0, 0):
+        print(f"Runtime profile '{profile['name']}': thread pools already set to "
+              f"{_applied_threads}, requested {threads} ignored")
+
+    tf.keras.mixed_precision.set_global_policy(profile['precision'])
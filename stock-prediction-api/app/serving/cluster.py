@@ -0,0 +1,85 @@
+"""
+Local sharded cluster for development and testing.
+
+Starts several API nodes on one host, each a separate uvicorn process with
+its own port, all sharing storage/models and one shard membership directory
+(see serving/sharding.py). Stop a node (kill <pid>) or start another one on
+a new port to watch the shards rebalance in /api/status.
+
+Usage (from stock-prediction-api/):
+    python -m app.serving.cluster --nodes 3 --base-port 8001
+    python -m app.serving.cluster --nodes 2 --mode redirect --shard-dir /tmp/shards
+
+A single extra node joins an existing cluster with:
+    SHARD_NODE_URL=http://127.0.0.1:8004 uvicorn app.main:app --port 8004
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+
+
+def start_node(host, port, shard_dir, mode, env=None):
+    """Start one API node; returns its subprocess.Popen"""
+    node_env = dict(env or os.environ)
+    node_env.update({
+        'SHARD_NODE_URL': f"http://{host}:{port}",
+        'SHARD_DIR': shard_dir,
+        'SHARD_MODE': mode,
+    })
+    command = [sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', host, '--port', str(port)]
+    return subprocess.Popen(command, env=node_env)
+
+
+def run_cluster(nodes=3, host="127.0.0.1", base_port=8001, shard_dir=None, mode="forward"):
+    """Run nodes until interrupted; a node that exits is reported and not restarted"""
+    from serving.sharding import get_shard_dir
+
+    shard_dir = os.path.abspath(shard_dir) if shard_dir else get_shard_dir()
+    os.makedirs(shard_dir, exist_ok=True)
+    processes = {base_port + i: start_node(host, base_port + i, shard_dir, mode) for i in range(nodes)}
+    for port, process in processes.items():
+        print(f"Node http://{host}:{port} started (pid {process.pid})")
+    print(f"Shard directory: {shard_dir}")
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    try:
+        while not stopping and any(process.poll() is None for process in processes.values()):
+            time.sleep(1.0)
+            for port, process in list(processes.items()):
+                if process.poll() is not None:
+                    print(f"Node http://{host}:{port} exited with code {process.returncode}")
+                    del processes[port]
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes.values():
+            if process.poll() is None:
+                process.terminate()
+        for process in processes.values():
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run several sharded API nodes on this host")
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--base-port', type=int, default=8001, help="Port of the first node, the others follow")
+    parser.add_argument('--shard-dir', help="Shared membership directory (default: storage/shards)")
+    parser.add_argument('--mode', choices=['forward', 'redirect'], default='forward',
+                        help="How a node answers /api/predict for a company it does not own")
+    args = parser.parse_args()
+
+    run_cluster(
+        nodes=args.nodes,
+        host=args.host,
+        base_port=args.base_port,
+        shard_dir=args.shard_dir,
+        mode=args.mode
+    )
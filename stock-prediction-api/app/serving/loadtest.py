@@ -0,0 +1,351 @@
+"""
+Load-testing harness for the prediction API.
+
+Drives /api/predict and /api/companies with a configurable number of
+concurrent keep-alive connections and reports the latency distribution,
+throughput and error rates as JSON, for comparison across versions.
+
+By default the app is started in-process on a free local port, with
+DATA_PROVIDER=offline prices and synthetic pre-trained model bundles in a
+temporary MODEL_STORAGE_DIR, so a run needs neither network nor TensorFlow.
+Pass --url to load an already running deployment instead.
+
+Usage (from stock-prediction-api/):
+    python -m app.serving.loadtest --duration 30 --concurrency 32
+    python -m app.serving.loadtest --tickers AAPL:5 MSFT:3 TSLA:1 --mix predict:9 companies:1
+    python -m app.serving.loadtest --url http://localhost:8000 --output before.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import contextlib
+from urllib.parse import urlsplit
+
+import numpy as np
+
+DEFAULT_TICKERS = ['AAPL', 'MSFT', 'NVDA', 'AMZN', 'GOOGL', 'META', 'TSLA', 'JPM']
+
+
+def create_synthetic_models(models_dir, tickers, slicing_window=40, units=64, lookback_period="50mo"):
+    """
+    Write a randomly initialised model bundle per ticker (no TensorFlow needed)
+
+    Shapes match the trainer's architecture, so inference cost is realistic.
+    """
+    from sklearn.preprocessing import StandardScaler
+    from model_ops.model_bundle import write_bundle, BUNDLE_EXTENSION
+    from data_pipeline.offline_provider import load_offline_data
+    from data_pipeline.trading_calendar import period_to_range
+
+    rng = np.random.default_rng(0)
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+
+    def glorot(shape):
+        limit = np.sqrt(6.0 / sum(shape))
+        return rng.uniform(-limit, limit, shape).astype(np.float32)
+
+    for ticker in tickers:
+        tensors = {
+            'layer0/kernel': glorot((1, 4 * units)),
+            'layer0/recurrent_kernel': glorot((units, 4 * units)),
+            'layer0/bias': np.zeros(4 * units, dtype=np.float32),
+            'layer1/kernel': glorot((units, 4 * units)),
+            'layer1/recurrent_kernel': glorot((units, 4 * units)),
+            'layer1/bias': np.zeros(4 * units, dtype=np.float32),
+            'layer2/kernel': glorot((units, 128)),
+            'layer2/bias': np.zeros(128, dtype=np.float32),
+            'layer4/kernel': glorot((128, 1)),
+            'layer4/bias': np.zeros(1, dtype=np.float32),
+        }
+        layers = [
+            {'type': 'lstm', 'units': units, 'return_sequences': True, 'activation': 'tanh',
+             'recurrent_activation': 'sigmoid', 'weights': ['layer0/kernel', 'layer0/recurrent_kernel', 'layer0/bias']},
+            {'type': 'lstm', 'units': units, 'return_sequences': False, 'activation': 'tanh',
+             'recurrent_activation': 'sigmoid', 'weights': ['layer1/kernel', 'layer1/recurrent_kernel', 'layer1/bias']},
+            {'type': 'dense', 'units': 128, 'activation': 'relu', 'weights': ['layer2/kernel', 'layer2/bias']},
+            {'type': 'dense', 'units': 1, 'activation': 'linear', 'weights': ['layer4/kernel', 'layer4/bias']},
+        ]
+        params = {'slicing_window': slicing_window, 'LSTM_units': units, 'dropout_rate': 0.2, 'epochs': 1}
+        metadata = {
+            'company': ticker,
+            'lookback_period': lookback_period,
+            'training_date': timestamp,
+            'best_hyperparameters': params,
+            'final_training_loss': None,
+            'final_validation_loss': None,
+            'slicing_window': slicing_window,
+            'model_architecture': {'LSTM_units': units, 'dropout_rate': 0.2, 'learning_rate': 0.001},
+            'synthetic': True
+        }
+        scaler = StandardScaler().fit(load_offline_data(ticker, *period_to_range(lookback_period)).values.reshape(-1, 1))
+
+        company_dir = os.path.join(models_dir, ticker)
+        os.makedirs(company_dir, exist_ok=True)
+        path = os.path.join(company_dir, f"{ticker}_{lookback_period}_{timestamp}{BUNDLE_EXTENSION}")
+        write_bundle(path, layers, tensors, (slicing_window, 1), scaler, metadata)
+
+
+class InProcessServer:
+    """Run the FastAPI app with uvicorn on a background thread"""
+
+    def __init__(self, tickers):
+        self.tickers = tickers
+        self.storage = tempfile.TemporaryDirectory(prefix="loadtest_models_")
+        self.server = None
+        self.thread = None
+        self.url = None
+
+    def __enter__(self):
+        # Must be set before the app modules read them
+        os.environ['DATA_PROVIDER'] = 'offline'
+        os.environ['MODEL_STORAGE_DIR'] = self.storage.name
+        create_synthetic_models(self.storage.name, self.tickers)
+
+        import uvicorn
+        from app.main import app
+
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+
+        config = uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning', access_log=False)
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+        self.storage.cleanup()
+
+
+class Connection:
+    """Minimal HTTP/1.1 keep-alive client (JSON request/response only)"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n")
+        self.writer.write(head.encode('ascii') + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Server closed the connection")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await self.reader.readexactly(int(headers.get('content-length', 0)))
+
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            with contextlib.suppress(Exception):
+                await self.writer.wait_closed()
+        self.reader = self.writer = None
+
+
+def _weighted(specs, default_weight=1.0):
+    """Parse ['AAPL:5', 'MSFT'] into (names, weights)"""
+    names, weights = [], []
+    for spec in specs:
+        name, _, weight = spec.partition(':')
+        names.append(name)
+        weights.append(float(weight) if weight else default_weight)
+    return names, weights
+
+
+def _summarize(latencies, errors, statuses, elapsed):
+    latencies_ms = np.array(latencies) * 1000
+    count = len(latencies_ms)
+    summary = {
+        'requests': count,
+        'errors': errors,
+        'error_rate': errors / count if count else 0.0,
+        'throughput_rps': count / elapsed if elapsed else 0.0,
+        'status_codes': {str(code): n for code, n in sorted(statuses.items())},
+    }
+    if count:
+        summary['latency_ms'] = {
+            'mean': float(latencies_ms.mean()),
+            'p50': float(np.percentile(latencies_ms, 50)),
+            'p90': float(np.percentile(latencies_ms, 90)),
+            'p99': float(np.percentile(latencies_ms, 99)),
+            'max': float(latencies_ms.max()),
+        }
+    return summary
+
+
+async def run_load(url, concurrency=16, duration=10.0, warmup=2.0, tickers=None, ticker_weights=None,
+                   mix=None, days_ahead=(10,), seed=0):
+    """
+    Drive the API and collect per-endpoint statistics
+
+    Args:
+        url: Base URL of the API
+        concurrency: Number of concurrent keep-alive connections
+        duration: Measured seconds (after warmup)
+        warmup: Seconds of load whose results are discarded
+        tickers / ticker_weights: Companies requested from /api/predict and their relative frequency
+        mix: Dictionary of endpoint -> relative frequency ('predict', 'companies')
+        days_ahead: Forecast horizons sampled uniformly for /api/predict
+
+    Returns:
+        Report dictionary (see module docstring)
+    """
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    tickers = tickers or DEFAULT_TICKERS
+    mix = mix or {'predict': 0.9, 'companies': 0.1}
+    endpoints, endpoint_weights = list(mix), list(mix.values())
+    rng = random.Random(seed)
+
+    results = {endpoint: {'latencies': [], 'errors': 0, 'statuses': {}} for endpoint in endpoints}
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    async def worker():
+        conn = Connection(host, port)
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                break
+            endpoint = rng.choices(endpoints, endpoint_weights)[0]
+            if endpoint == 'predict':
+                body = {
+                    'company': rng.choices(tickers, ticker_weights)[0],
+                    'days_ahead': rng.choice(days_ahead)
+                }
+                call = conn.request('POST', '/api/predict', body)
+            else:
+                call = conn.request('GET', '/api/companies')
+
+            sent = time.perf_counter()
+            try:
+                status = await call
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+                status = None
+                await conn.close()
+            latency = time.perf_counter() - sent
+
+            if sent >= measure_from:
+                stats = results[endpoint]
+                stats['latencies'].append(latency)
+                stats['statuses'][status or 0] = stats['statuses'].get(status or 0, 0) + 1
+                if status is None or status >= 400:
+                    stats['errors'] += 1
+        await conn.close()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    elapsed = time.perf_counter() - measure_from
+    report = {
+        'config': {
+            'url': url,
+            'concurrency': concurrency,
+            'duration_seconds': duration,
+            'warmup_seconds': warmup,
+            'tickers': dict(zip(tickers, ticker_weights or [1.0] * len(tickers))),
+            'mix': mix,
+            'days_ahead': list(days_ahead),
+        },
+        'endpoints': {
+            f"/api/{endpoint}": _summarize(stats['latencies'], stats['errors'], stats['statuses'], elapsed)
+            for endpoint, stats in results.items()
+        },
+    }
+    all_latencies = [lat for stats in results.values() for lat in stats['latencies']]
+    all_statuses = {}
+    for stats in results.values():
+        for code, n in stats['statuses'].items():
+            all_statuses[code] = all_statuses.get(code, 0) + n
+    report['total'] = _summarize(all_latencies, sum(s['errors'] for s in results.values()), all_statuses, elapsed)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/predict and /api/companies")
+    parser.add_argument('--url', help="Target an existing deployment instead of an in-process app")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--tickers', nargs='+', default=DEFAULT_TICKERS,
+                        help="Tickers with optional weights, e.g. AAPL:5 MSFT:1")
+    parser.add_argument('--mix', nargs='+', default=['predict:0.9', 'companies:0.1'],
+                        help="Endpoint mix with weights, e.g. predict:9 companies:1")
+    parser.add_argument('--days-ahead', nargs='+', type=int, default=[10])
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    tickers, ticker_weights = _weighted(args.tickers)
+    mix_names, mix_weights = _weighted(args.mix)
+    mix = dict(zip(mix_names, mix_weights))
+    unknown = set(mix) - {'predict', 'companies'}
+    if unknown:
+        parser.error(f"Unknown endpoints in --mix: {sorted(unknown)}")
+
+    def load(url):
+        return asyncio.run(run_load(
+            url, concurrency=args.concurrency, duration=args.duration, warmup=args.warmup,
+            tickers=tickers, ticker_weights=ticker_weights, mix=mix, days_ahead=args.days_ahead
+        ))
+
+    print(f"Load testing for {args.warmup + args.duration:.0f}s with {args.concurrency} connections...",
+          file=sys.stderr)
+    if args.url:
+        report = load(args.url)
+    else:
+        # The app logs every request to stdout; keep stdout for the report
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            with InProcessServer(tickers) as server:
+                report = load(server.url)
+        report['config']['url'] = 'in-process'
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+        print(f"Report written to {args.output}", file=sys.stderr)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Pre-fork multi-worker serving mode.
+
+The master process imports the FastAPI app, memory-maps the model bundles of
+the registry once, freezes the heap and then forks the uvicorn workers, which
+all accept on one shared listening socket. Workers inherit the loaded models
+copy-on-write and the bundle weights are read-only shared mappings, so adding
+workers adds almost no model memory. Serving workers never import TensorFlow
+(it is only loaded by a worker that handles /api/train).
+
+When save_model_package / delete_models publish a new storage generation, the
+master reloads the registry and rolls the workers: a fresh set is forked from
+the updated master, then the old set gets SIGTERM and drains its requests.
+SIGHUP forces the same reload.
+
+Usage (from stock-prediction-api/):
+    python -m app.serving.prefork --workers 4 --port 8000
+    python -m app.serving.prefork --workers 8 --preload MSFT AAPL
+"""
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import argparse
+import threading
+
+import uvicorn
+
+from app.main import app
+from model_ops.model_manager import get_models_generation
+from model_ops.model_registry import preload_models
+
+
+class PreforkServer:
+    """Master process: owns the listening socket, the preloaded models and the workers"""
+
+    def __init__(self, host="0.0.0.0", port=8000, workers=2, preload=None, reload_interval=2.0):
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.preload = preload
+        self.reload_interval = reload_interval
+        self.workers = set()
+        self.generation = None
+        self.sock = None
+        self._reload_requested = False
+        self._stopping = False
+
+    def _bind(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _load_models(self):
+        self.generation = get_models_generation()
+        loaded = preload_models(self.preload)
+        print(f"Master {os.getpid()}: preloaded {len(loaded)} models (generation {self.generation})")
+        # Move everything allocated so far out of the GC's reach, so collections
+        # in the workers do not write to (and un-share) the inherited pages
+        gc.collect()
+        gc.freeze()
+
+    def _watch_master(self, master_pid):
+        """Worker thread: stop serving if the master dies"""
+        while os.getppid() == master_pid:
+            time.sleep(1.0)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    def _spawn_worker(self):
+        master_pid = os.getpid()
+        pid = os.fork()
+        if pid == 0:
+            # Worker: default signal handling, uvicorn installs its own
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+                signal.signal(sig, signal.SIG_DFL)
+            threading.Thread(target=self._watch_master, args=(master_pid,), daemon=True).start()
+            config = uvicorn.Config(app, host=self.host, port=self.port, log_level="info")
+            server = uvicorn.Server(config)
+            try:
+                server.run(sockets=[self.sock])
+            finally:
+                os._exit(0)
+        self.workers.add(pid)
+        return pid
+
+    def _spawn_workers(self):
+        return {self._spawn_worker() for _ in range(self.num_workers)}
+
+    def _stop_workers(self, pids, sig=signal.SIGTERM):
+        for pid in pids:
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self):
+        """Collect exited workers; returns how many exited"""
+        exited = 0
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return exited
+            if pid == 0:
+                return exited
+            if pid in self.workers:
+                self.workers.discard(pid)
+                exited += 1
+
+    def _roll_workers(self):
+        """Reload models in the master, then replace every worker"""
+        old_workers = set(self.workers)
+        gc.unfreeze()
+        self._load_models()
+        self._spawn_workers()
+        self._stop_workers(old_workers)
+        print(f"Master {os.getpid()}: rolled {len(old_workers)} workers onto generation {self.generation}")
+        return old_workers
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _handle_reload(self, signum, frame):
+        self._reload_requested = True
+
+    def run(self):
+        self.sock = self._bind()
+        self._load_models()
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        self._spawn_workers()
+        print(f"Master {os.getpid()}: serving on {self.host}:{self.port} with {self.num_workers} workers")
+
+        draining = set()
+        while not self._stopping:
+            time.sleep(self.reload_interval)
+            self._reap()
+            if self._stopping:
+                # Ctrl-C reaches the whole process group; workers are already exiting
+                break
+            draining &= self.workers
+
+            if self._reload_requested or get_models_generation() != self.generation:
+                self._reload_requested = False
+                draining |= self._roll_workers()
+
+            # Replace workers that crashed (draining ones are expected to exit)
+            missing = self.num_workers - len(self.workers - draining)
+            for _ in range(missing):
+                print(f"Master {os.getpid()}: restarting a worker")
+                self._spawn_worker()
+
+        print(f"Master {os.getpid()}: shutting down {len(self.workers)} workers")
+        self._stop_workers(self.workers)
+        deadline = time.time() + 30
+        while self.workers and time.time() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        self._stop_workers(self.workers, signal.SIGKILL)
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the API from pre-forked workers sharing preloaded models")
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1)))
+    parser.add_argument('--preload', nargs='*', help="Companies to preload (default: every company with a bundle)")
+    parser.add_argument('--reload-interval', type=float, default=2.0,
+                        help="Seconds between checks for newly published models")
+    args = parser.parse_args()
+
+    if sys.platform == 'win32':
+        raise SystemExit("Pre-fork serving requires os.fork (Linux/macOS)")
+
+    PreforkServer(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        preload=args.preload,
+        reload_interval=args.reload_interval
+    ).run()
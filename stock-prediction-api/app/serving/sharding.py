@@ -0,0 +1,285 @@
+"""
+Sharded model serving across several API nodes.
+
+Companies are assigned to nodes with a consistent-hash ring (SHARD_VNODES
+virtual points per node), so each node only loads the models of its own
+shard and a join or leave moves about 1/N of the companies. Membership lives
+in a shared directory: every node rewrites a heartbeat file
+(<node id>.json with its URL) every SHARD_HEARTBEAT_SECONDS, and nodes whose
+file is older than SHARD_NODE_TIMEOUT are dropped from the ring. A node that
+shuts down cleanly removes its file and leaves immediately.
+
+When membership changes, each node evicts the cached models it no longer
+owns and preloads the ones it gained. /api/predict on a non-owner forwards
+the request to the owner (or answers 307 with SHARD_MODE=redirect); the
+X-Shard-Forwarded header on forwarded requests, and the shard_forwarded
+query flag on redirect targets, stop a request from hopping twice (or
+bouncing between nodes) while they briefly disagree about the ring. Storage is shared, so a node can always
+serve a request itself when the owner is unreachable.
+
+Environment:
+    SHARD_NODE_URL           base URL other nodes reach this node at; enables sharding
+    SHARD_DIR                shared membership directory (default: storage/shards)
+    SHARD_MODE               'forward' (default) or 'redirect'
+    SHARD_VNODES             virtual nodes per node (default 64)
+    SHARD_HEARTBEAT_SECONDS  heartbeat interval (default 2)
+    SHARD_NODE_TIMEOUT       seconds without a heartbeat before a node is dropped (default 10)
+    SHARD_FORWARD_TIMEOUT    seconds to wait for the owner's answer (default 30)
+"""
+import os
+import json
+import time
+import bisect
+import hashlib
+import threading
+import urllib.error
+import urllib.request
+
+FORWARDED_HEADER = "X-Shard-Forwarded"
+# Clients following a 307 do not add headers, so redirect targets carry a query flag instead
+FORWARDED_PARAM = "shard_forwarded"
+DEFAULT_VNODES = 64
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+def node_id_for_url(url):
+    """File-safe node id derived from its URL"""
+    return hashlib.sha1(url.rstrip('/').encode('utf-8')).hexdigest()[:12]
+
+
+class HashRing:
+    """Consistent-hash ring mapping companies to node ids"""
+
+    def __init__(self, nodes=(), vnodes=DEFAULT_VNODES):
+        self.nodes = sorted(set(nodes))
+        self.vnodes = vnodes
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, company):
+        """Node id owning a company, or None on an empty ring"""
+        if not self._owners:
+            return None
+        index = bisect.bisect(self._hashes, _hash(company.upper())) % len(self._hashes)
+        return self._owners[index]
+
+    def assignments(self, companies):
+        """Dictionary node id -> sorted companies it owns"""
+        shards = {node: [] for node in self.nodes}
+        for company in sorted(companies):
+            shards[self.owner(company)].append(company)
+        return shards
+
+
+def get_shard_dir():
+    """Shared membership directory (SHARD_DIR, default storage/shards next to storage/models)"""
+    if os.environ.get('SHARD_DIR'):
+        return os.path.abspath(os.environ['SHARD_DIR'])
+    from model_ops.model_manager import get_models_root
+    return os.path.join(os.path.dirname(get_models_root()), "shards")
+
+
+class ShardMembership:
+    """This node's heartbeat plus the ring of live nodes read from the shared directory"""
+
+    def __init__(self, node_url, shard_dir=None, vnodes=DEFAULT_VNODES, heartbeat_seconds=2.0,
+                 node_timeout=10.0, forward_timeout=30.0):
+        self.node_url = node_url.rstrip('/')
+        self.node_id = node_id_for_url(self.node_url)
+        self.shard_dir = shard_dir or get_shard_dir()
+        self.vnodes = vnodes
+        self.heartbeat_seconds = heartbeat_seconds
+        self.node_timeout = node_timeout
+        self.forward_timeout = forward_timeout
+        self.started_at = time.time()
+        self.rebalances = 0
+        self._lock = threading.Lock()
+        self._urls = {}
+        self._ring = HashRing([self.node_id], vnodes)
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def heartbeat_path(self):
+        return os.path.join(self.shard_dir, f"{self.node_id}.json")
+
+    def _write_heartbeat(self):
+        os.makedirs(self.shard_dir, exist_ok=True)
+        tmp_path = f"{self.heartbeat_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'url': self.node_url, 'pid': os.getpid(), 'started_at': self.started_at}, f)
+        # Readers use the file's mtime as the heartbeat time
+        os.replace(tmp_path, self.heartbeat_path)
+
+    def _read_members(self):
+        """Live nodes in the shared directory: node id -> URL"""
+        members = {self.node_id: self.node_url}
+        now = time.time()
+        for name in os.listdir(self.shard_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.shard_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.node_timeout:
+                    continue
+                with open(path, 'r') as f:
+                    members[name[:-len('.json')]] = json.load(f)['url']
+            except (OSError, ValueError, KeyError):
+                # Removed or half-written by its node; picked up on the next beat
+                continue
+        return members
+
+    def refresh(self):
+        """Heartbeat, re-read membership and rebalance if it changed; returns True on a change"""
+        self._write_heartbeat()
+        members = self._read_members()
+        with self._lock:
+            if set(members) == set(self._urls):
+                self._urls = members
+                return False
+            previous = len(self._urls)
+            self._urls = members
+            self._ring = HashRing(members, self.vnodes)
+            self.rebalances += 1
+        print(f"Shard {self.node_id}: ring changed from {previous} to {len(members)} nodes")
+        self._rebalance()
+        return True
+
+    def _rebalance(self):
+        """Drop cached models this node no longer owns and preload the ones it gained"""
+        from model_ops.model_manager import get_all_companies_with_models
+        from model_ops.model_registry import preload_models, evict_models, cached_companies
+
+        owned = set(self.owned_companies(get_all_companies_with_models()))
+        evicted = evict_models([company for company in cached_companies() if company not in owned])
+        loaded = preload_models(sorted(owned)) if owned else []
+        print(f"Shard {self.node_id}: owns {len(owned)} companies, "
+              f"evicted {len(evicted)}, preloaded {len(loaded)}")
+
+    def _run(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Shard {self.node_id}: heartbeat failed: {e}")
+
+    def start(self):
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name="shard-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop heartbeating and leave the ring"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            os.remove(self.heartbeat_path)
+        except FileNotFoundError:
+            pass
+
+    def owner_url(self, company):
+        """Base URL of the node owning a company"""
+        with self._lock:
+            return self._urls.get(self._ring.owner(company), self.node_url)
+
+    def owned_companies(self, companies):
+        with self._lock:
+            return [company for company in companies if self._ring.owner(company) == self.node_id]
+
+    def status(self):
+        from model_ops.model_manager import get_all_companies_with_models
+        from model_ops.model_registry import cached_companies
+
+        companies = get_all_companies_with_models()
+        with self._lock:
+            shards = self._ring.assignments(companies)
+            nodes = [{'node_id': node, 'url': self._urls.get(node), 'companies': len(shards[node])}
+                     for node in self._ring.nodes]
+            rebalances = self.rebalances
+        return {
+            'node_id': self.node_id,
+            'node_url': self.node_url,
+            'mode': get_shard_mode(),
+            'nodes': nodes,
+            'owned_companies': shards.get(self.node_id, []),
+            'cached_companies': cached_companies(),
+            'rebalances': rebalances,
+        }
+
+
+def was_forwarded(request):
+    """True when another node already forwarded or redirected this request"""
+    return bool(request.headers.get(FORWARDED_HEADER) or request.query_params.get(FORWARDED_PARAM))
+
+
+def redirect_url(url):
+    """url marked as a redirect target, so the receiving node serves it itself"""
+    return f"{url}{'&' if '?' in url else '?'}{FORWARDED_PARAM}=1"
+
+
+def forward_request(url, payload, timeout):
+    """
+    POST a JSON payload to another node, marked as already forwarded
+
+    Returns:
+        Tuple (status code, decoded JSON body)
+
+    Raises:
+        OSError: The node could not be reached
+    """
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode('utf-8'), method='POST',
+        headers={'Content-Type': 'application/json', FORWARDED_HEADER: '1'}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        # The owner answered with an error (e.g. 404): pass it on unchanged
+        body = e.read().decode('utf-8')
+        try:
+            return e.code, json.loads(body)
+        except ValueError:
+            return e.code, {'detail': body or e.reason}
+
+
+def get_shard_mode():
+    mode = os.environ.get('SHARD_MODE', 'forward')
+    if mode not in ('forward', 'redirect'):
+        raise ValueError(f"Unknown SHARD_MODE: {mode}")
+    return mode
+
+
+_membership = None
+_membership_lock = threading.Lock()
+
+
+def get_membership():
+    """This process's shard membership, or None when SHARD_NODE_URL is not set"""
+    global _membership
+    if not os.environ.get('SHARD_NODE_URL'):
+        return None
+    with _membership_lock:
+        if _membership is None:
+            _membership = ShardMembership(
+                node_url=os.environ['SHARD_NODE_URL'],
+                vnodes=int(os.environ.get('SHARD_VNODES', DEFAULT_VNODES)),
+                heartbeat_seconds=float(os.environ.get('SHARD_HEARTBEAT_SECONDS', 2.0)),
+                node_timeout=float(os.environ.get('SHARD_NODE_TIMEOUT', 10.0)),
+                forward_timeout=float(os.environ.get('SHARD_FORWARD_TIMEOUT', 30.0)),
+            )
+            _membership.start()
+        return _membership
+
+
+def stop_membership():
+    global _membership
+    with _membership_lock:
+        if _membership is not None:
+            _membership.stop()
+            _membership = None
@@ -0,0 +1,339 @@
+"""
+Separate execution pools for training and inference.
+
+Training jobs run in spawned worker processes pinned to the training cores,
+at a lower CPU priority (nice) and with TensorFlow's intra-op threads capped,
+so a running job cannot take the cores that serve predictions. Each worker
+process handles a single job (fresh TensorFlow, so every job's runtime
+profile thread settings apply and memory is returned afterwards).
+
+Jobs wait in a bounded queue; when it is full, submit() raises
+TrainingQueueFull with a Retry-After estimate (/api/train answers 429).
+Queued jobs are held back while predictions are in flight (for at most
+TRAINING_START_MAX_DELAY seconds), so short predictions go first.
+
+Predictions run on a thread pool pinned to the inference cores.
+
+Environment (budgets are per API process):
+    INFERENCE_CPUS            cores for prediction threads, e.g. "0-1" (default: a quarter, at least 1)
+    TRAINING_CPUS             cores for training processes, e.g. "2-7" (default: the remaining cores)
+    INFERENCE_THREADS         prediction threads (default: number of inference cores)
+    TRAINING_WORKERS          training jobs running at once (default 1)
+    TRAINING_THREADS          TensorFlow intra-op threads per job (default: training cores / workers)
+    TRAINING_QUEUE_SIZE       jobs waiting for a worker before 429 (default 4)
+    TRAINING_NICE             niceness added to training processes (default 10)
+    TRAINING_START_MAX_DELAY  seconds a queued job yields to predictions (default 2)
+"""
+import os
+import math
+import time
+import asyncio
+import functools
+import importlib
+import threading
+import collections
+import multiprocessing
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Retry-After estimate until the first job has finished
+DEFAULT_TRAINING_SECONDS = 120
+
+
+class TrainingQueueFull(Exception):
+    """The training queue is at capacity; retry_after is a wait estimate in seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Training queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+def parse_cpu_list(value):
+    """Parse a Linux-style CPU list ('0-3,6') into sorted core ids"""
+    cpus = set()
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-')
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+
+def _available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def get_core_budget():
+    """Cores assigned to inference and to training"""
+    available = _available_cpus()
+    if 'INFERENCE_CPUS' in os.environ:
+        inference = parse_cpu_list(os.environ['INFERENCE_CPUS'])
+    else:
+        inference = available[:max(1, len(available) // 4)]
+    if 'TRAINING_CPUS' in os.environ:
+        training = parse_cpu_list(os.environ['TRAINING_CPUS'])
+    else:
+        # A single-core host has nothing to split; nice still favours inference
+        training = [cpu for cpu in available if cpu not in inference] or available
+    return {'inference': inference, 'training': training}
+
+
+def _pin_current(cpus):
+    """Restrict the calling thread (and its future children) to cpus"""
+    if hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            print(f"Could not pin to cores {cpus}: {e}")
+
+
+def _training_worker_init(cpus, threads, niceness):
+    _pin_current(cpus)
+    if niceness and hasattr(os, 'nice'):
+        os.nice(niceness)
+    # Read by get_runtime_profile, so it caps every job's profile
+    os.environ['RUNTIME_INTRA_OP_THREADS'] = str(threads)
+
+
+def _run_job(target, kwargs):
+    """Worker process entry point; target is 'module:function' so the API process never imports it"""
+    module_name, function_name = target.split(':')
+    function = getattr(importlib.import_module(module_name), function_name)
+    return function(**kwargs)
+
+
+class InferencePool:
+    """Thread pool pinned to the inference cores"""
+
+    def __init__(self, cpus, threads):
+        self.cpus = cpus
+        self.threads = threads
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="inference",
+                                            initializer=_pin_current, initargs=(cpus,))
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+
+    async def run(self, function, *args, **kwargs):
+        """Run a blocking call on the pool and await its result"""
+        with self._lock:
+            self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(function, *args, **kwargs))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+
+    def status(self):
+        return {'cpus': self.cpus, 'threads': self.threads,
+                'in_flight': self.in_flight, 'completed': self.completed}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class TrainingQueue:
+    """Bounded queue in front of the training worker processes"""
+
+    def __init__(self, cpus, workers=1, max_queued=4, threads=None, niceness=10, inference=None,
+                 max_start_delay=2.0):
+        self.cpus = cpus
+        self.workers = workers
+        self.max_queued = max_queued
+        self.threads = threads or max(1, len(cpus) // workers)
+        self.niceness = niceness
+        self.inference = inference
+        self.max_start_delay = max_start_delay
+        self._executor = None
+        self._pending = collections.deque()
+        self._running = {}
+        self._cond = threading.Condition()
+        self._waits = collections.deque(maxlen=50)
+        self._durations = collections.deque(maxlen=20)
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._dispatcher = threading.Thread(target=self._dispatch, name="training-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def _get_executor(self):
+        if self._executor is None:
+            # TensorFlow is not fork-safe; one job per process returns its memory to the OS
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_training_worker_init,
+                initargs=(self.cpus, self.threads, self.niceness),
+                max_tasks_per_child=1,
+            )
+        return self._executor
+
+    def submit(self, target, **kwargs):
+        """
+        Queue a training job
+
+        Args:
+            target: 'module:function' run in a training process with kwargs
+
+        Returns:
+            concurrent.futures.Future with the function's return value
+
+        Raises:
+            TrainingQueueFull: If max_queued jobs are already waiting
+        """
+        future = Future()
+        with self._cond:
+            if len(self._pending) >= self.max_queued:
+                self.rejected += 1
+                raise TrainingQueueFull(self._retry_after())
+            self._pending.append((target, kwargs, future, time.time()))
+            self._cond.notify_all()
+        return future
+
+    def _retry_after(self):
+        """Seconds until a queued job is likely to start (frees a queue slot)"""
+        typical = (sum(self._durations) / len(self._durations)) if self._durations else DEFAULT_TRAINING_SECONDS
+        now = time.time()
+        elapsed = max((now - started for started in self._running.values()), default=0)
+        return max(1, math.ceil(typical - elapsed))
+
+    def _inference_busy(self):
+        return self.inference is not None and self.inference.in_flight > 0
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._pending or len(self._running) >= self.workers:
+                    self._cond.wait()
+            # Predictions first: hold the next job while they run, but never starve it
+            eligible_at = time.time()
+            while self._inference_busy() and time.time() - eligible_at < self.max_start_delay:
+                time.sleep(0.01)
+
+            with self._cond:
+                if not self._pending:
+                    continue
+                target, kwargs, future, enqueued_at = self._pending.popleft()
+                if not future.set_running_or_notify_cancel():
+                    # The client went away while the job was queued
+                    continue
+                started = time.time()
+                self._waits.append(started - enqueued_at)
+                self._running[future] = started
+            try:
+                job = self._get_executor().submit(_run_job, target, kwargs)
+            except (BrokenProcessPool, RuntimeError) as e:
+                self._executor = None
+                self._finish(future, started, error=e)
+                continue
+            job.add_done_callback(functools.partial(self._job_done, future, started))
+
+    def _job_done(self, future, started, job):
+        error = CancelledError() if job.cancelled() else job.exception()
+        if isinstance(error, BrokenProcessPool):
+            # A worker died (e.g. out of memory); start a fresh pool for the next job
+            self._executor = None
+        self._finish(future, started, result=None if error else job.result(), error=error)
+
+    def _finish(self, future, started, result=None, error=None):
+        with self._cond:
+            self._running.pop(future, None)
+            if error is None:
+                self.completed += 1
+                self._durations.append(time.time() - started)
+            else:
+                self.failed += 1
+            self._cond.notify_all()
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def status(self):
+        with self._cond:
+            now = time.time()
+            waits = list(self._waits)
+            return {
+                'cpus': self.cpus,
+                'workers': self.workers,
+                'threads_per_job': self.threads,
+                'queue_depth': len(self._pending),
+                'queue_capacity': self.max_queued,
+                'running': len(self._running),
+                'oldest_queued_seconds': round(now - self._pending[0][3], 2) if self._pending else 0.0,
+                'avg_wait_seconds': round(sum(waits) / len(waits), 2) if waits else 0.0,
+                'max_wait_seconds': round(max(waits), 2) if waits else 0.0,
+                'avg_run_seconds': round(sum(self._durations) / len(self._durations), 2) if self._durations else None,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+            }
+
+    def shutdown(self):
+        """Cancel queued jobs and stop the workers (running jobs are aborted)"""
+        with self._cond:
+            while self._pending:
+                self._pending.popleft()[2].cancel()
+        if self._executor is not None:
+            # Kill the workers first: the pool then fails the running jobs instead of respawning
+            for process in multiprocessing.active_children():
+                process.terminate()
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_inference_pool = None
+_training_queue = None
+_pools_lock = threading.Lock()
+
+
+def get_inference_pool():
+    """Process-wide inference pool (created on first use, after any pre-fork)"""
+    global _inference_pool
+    with _pools_lock:
+        if _inference_pool is None:
+            cpus = get_core_budget()['inference']
+            threads = int(os.environ.get('INFERENCE_THREADS', len(cpus)))
+            _inference_pool = InferencePool(cpus, threads)
+        return _inference_pool
+
+
+def get_training_queue():
+    """Process-wide training queue (created on first use, after any pre-fork)"""
+    global _training_queue
+    inference = get_inference_pool()
+    with _pools_lock:
+        if _training_queue is None:
+            _training_queue = TrainingQueue(
+                cpus=get_core_budget()['training'],
+                workers=int(os.environ.get('TRAINING_WORKERS', 1)),
+                max_queued=int(os.environ.get('TRAINING_QUEUE_SIZE', 4)),
+                threads=int(os.environ['TRAINING_THREADS']) if 'TRAINING_THREADS' in os.environ else None,
+                niceness=int(os.environ.get('TRAINING_NICE', 10)),
+                inference=inference,
+                max_start_delay=float(os.environ.get('TRAINING_START_MAX_DELAY', 2.0)),
+            )
+        return _training_queue
+
+
+def workload_status():
+    """Queue depth, wait times and core budgets for /api/status"""
+    return {
+        'inference': get_inference_pool().status(),
+        'training': get_training_queue().status(),
+    }
+
+
+def shutdown_workloads():
+    with _pools_lock:
+        if _training_queue is not None:
+            _training_queue.shutdown()
+        if _inference_pool is not None:
+            _inference_pool.shutdown()
@@ -1,6 +1,7 @@
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
-os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+# oneDNN, thread pools, XLA and batch size come from the runtime profile
+# (RUNTIME_PROFILE / RUNTIME_* env vars, see runtime_profile/profiles.py)
 
 import time
 import sys
@@ -14,8 +15,10 @@ from hyperparameter_tuner.tuner import optimize_hyperparameters
 from model_trainer.trainer import train_final_model
 from app.model_ops.model_manager import save_model_package, load_model_package, get_company_models
 from app.model_ops.model_predictor import predict_future
+from runtime_profile.profiles import get_runtime_profile
 
-def run_complete_pipeline(company='MSFT', lookback_period="50mo", n_trials=5):
+def run_complete_pipeline(company='MSFT', lookback_period="50mo", n_trials=5, runtime_profile=None,
+                          checkpoint_path=None, search_mode=None, selection=None):
     """
     Complete pipeline from data loading to model saving with enhanced logging
     """
@@ -25,6 +28,8 @@ def run_complete_pipeline(company='MSFT', lookback_period="50mo", n_trials=5):
     print(f"📈 Company: {company}")
     print(f"⏰ Lookback: {lookback_period}")
     print(f"🔬 Trials: {n_trials}")
+    profile = get_runtime_profile(runtime_profile)
+    print(f"🖥️  Runtime profile: {profile['name']}")
     print("=" * 50)
     
     # Track timing
@@ -45,7 +50,9 @@ def run_complete_pipeline(company='MSFT', lookback_period="50mo", n_trials=5):
         # 2. Hyperparameter Optimization
         print("\n⚙️  PHASE 2: Hyperparameter Optimization...")
         tuning_start = time.time()
-        best_hyperparams = optimize_hyperparameters(data, n_trials=n_trials)
+        best_hyperparams = optimize_hyperparameters(data, n_trials=n_trials, profile=profile,
+                                                    checkpoint_path=checkpoint_path,
+                                                    search_mode=search_mode, selection=selection)
         tuning_time = time.time() - tuning_start
         
         print(f"✅ Best hyperparameters found:")
@@ -56,7 +63,8 @@ def run_complete_pipeline(company='MSFT', lookback_period="50mo", n_trials=5):
         # 3. Final Model Training
         print("\n🎯 PHASE 3: Final Model Training...")
         training_start = time.time()
-        model, history, scaler = train_final_model(data, best_hyperparams)
+        model, history, scaler = train_final_model(data, best_hyperparams, profile=profile,
+                                                   warm_start_weights=checkpoint_path)
         training_time = time.time() - training_start
         
         final_train_loss = history['loss'][-1] if history['loss'] else 'N/A'
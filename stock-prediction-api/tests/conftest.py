@@ -0,0 +1,5 @@
+import os
+import sys
+
+# App modules import each other from the app directory (e.g. model_ops.model_bundle)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
@@ -0,0 +1,68 @@
+"""
+Post-close forecast table built from tuned models with mixed unit counts.
+"""
+import os
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from hyperparameter_tuner.tuner import build_model
+from data_pipeline.data_loader import load_recent_bars
+from data_pipeline.trading_calendar import last_completed_session
+from model_ops import forecast_table, model_predictor
+from model_ops.model_bundle import BUNDLE_EXTENSION, write_model_bundle
+from model_ops.model_manager import load_model_package
+
+# (company, cell, units, slicing_window): the first three share a window and differ in units
+MODELS = [
+    ('AAA', 'gru', 8, 10),
+    ('BBB', 'gru', 12, 10),
+    ('CCC', 'gru', 5, 10),
+    ('DDD', 'gru', 8, 14),
+    ('EEE', 'lstm', 6, 10),
+]
+
+
+@pytest.fixture
+def models_root(tmp_path, monkeypatch):
+    monkeypatch.setenv('MODEL_STORAGE_DIR', str(tmp_path))
+    monkeypatch.setenv('DATA_PROVIDER', 'offline')
+    rng = np.random.default_rng(0)
+    for company, cell, units, slicing_window in MODELS:
+        params = {'cell': cell, 'recurrent_layers': 1, 'LSTM_units': units, 'dropout_rate': 0.2}
+        model = build_model(params, slicing_window)
+        model.set_weights([rng.normal(0.0, 0.3, weight.shape).astype(np.float32) for weight in model.get_weights()])
+        scaler = StandardScaler().fit(load_recent_bars(company, 500).values.reshape(-1, 1))
+        metadata = {'company': company, 'slicing_window': slicing_window, 'training_date': '2024-01-02'}
+        company_dir = tmp_path / company
+        company_dir.mkdir()
+        write_model_bundle(str(company_dir / f"{company}_model_20240102_000000{BUNDLE_EXTENSION}"),
+                           model, scaler, metadata)
+    return tmp_path
+
+
+def test_mixed_units_share_a_pass_and_match_per_model_forecasts(models_root, monkeypatch):
+    groups = []
+    stack_packages = model_predictor.stack_packages
+
+    def recording_stack_packages(model_packages, pad_widths=False):
+        stacks = stack_packages(model_packages, pad_widths)
+        groups.extend(sorted(model_packages[i]['metadata']['company'] for i in indices)
+                      for indices, _, _ in stacks)
+        return stacks
+
+    monkeypatch.setattr(model_predictor, 'stack_packages', recording_stack_packages)
+    companies = [company for company, *_ in MODELS]
+    result = forecast_table.build_forecast_table(companies)
+
+    assert result == {'companies': companies, 'failed': {}}
+    assert sorted(groups) == [['AAA', 'BBB', 'CCC'], ['DDD'], ['EEE']]
+
+    header, forecasts = forecast_table.read_forecast_table(forecast_table.get_forecast_table_path())
+    as_of = last_completed_session()
+    for company, entry in header['rows'].items():
+        package = load_model_package(company)
+        slicing_window = package['metadata']['slicing_window']
+        prices = load_recent_bars(company, slicing_window, end=as_of).values
+        expected = model_predictor.predict_future(package, forecast_table.FORECAST_HORIZON, latest_prices=prices)
+        np.testing.assert_allclose(forecasts[entry['row']], expected, rtol=1e-4)
@@ -0,0 +1,104 @@
+"""
+The NumPy forward pass of model bundles (the serving path) against Keras.
+
+Tiny models with random weights (including biases, which Keras initializes
+to zeros) cover LSTM and GRU (reset_after) cells with one and two recurrent
+layers, zero-padded widths, stacking and int8 quantization.
+"""
+import os
+import sys
+import json
+import pickle
+import subprocess
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from hyperparameter_tuner.tuner import build_model
+from model_ops.model_bundle import BUNDLE_EXTENSION, BundleModel, extract_layers, pad_models, stack_models
+from model_ops.quantization import quantize_tensors
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SLICING_WINDOW = 12
+ARCHITECTURES = [(cell, layers) for cell in ('lstm', 'gru') for layers in (1, 2)]
+
+
+def _keras_model(cell, recurrent_layers, units, seed):
+    params = {'cell': cell, 'recurrent_layers': recurrent_layers, 'LSTM_units': units, 'dropout_rate': 0.2}
+    model = build_model(params, SLICING_WINDOW)
+    rng = np.random.default_rng(seed)
+    model.set_weights([rng.normal(0.0, 0.3, weight.shape).astype(np.float32) for weight in model.get_weights()])
+    return model
+
+
+def _bundle_model(model, int8=False):
+    layers, tensors = extract_layers(model)
+    if not int8:
+        return BundleModel(layers, tensors, model.input_shape[1:])
+    extra, mapping = quantize_tensors(layers, tensors)
+    return BundleModel(layers, dict(tensors, **{name: extra[q] for name, (q, _) in mapping.items()}),
+                       model.input_shape[1:], scales={name: extra[s] for name, (_, s) in mapping.items()})
+
+
+def _inputs(batch=5, seed=0):
+    return np.random.default_rng(seed).normal(size=(batch, SLICING_WINDOW, 1)).astype(np.float32)
+
+
+@pytest.mark.parametrize("cell,recurrent_layers", ARCHITECTURES)
+def test_bundle_matches_keras(cell, recurrent_layers):
+    model = _keras_model(cell, recurrent_layers, units=8, seed=1)
+    X = _inputs()
+    np.testing.assert_allclose(_bundle_model(model).predict(X), model.predict(X, verbose=0), atol=1e-5)
+
+
+@pytest.mark.parametrize("cell,recurrent_layers", ARCHITECTURES)
+def test_padded_stack_matches_keras(cell, recurrent_layers):
+    models = [_keras_model(cell, recurrent_layers, units, seed) for seed, units in enumerate((8, 12, 6))]
+    X = _inputs()
+    expected = np.stack([model.predict(X, verbose=0) for model in models])
+
+    padded = pad_models([_bundle_model(model) for model in models])
+    assert {layer['units'] for model in padded for layer in model.layers[:recurrent_layers]} == {12}
+    for model, target in zip(padded, expected):
+        np.testing.assert_allclose(model.predict(X), target, atol=1e-5)
+
+    stacked = stack_models(padded).predict(np.broadcast_to(X, (len(models),) + X.shape))
+    np.testing.assert_allclose(stacked, expected, atol=1e-5)
+
+
+@pytest.mark.parametrize("cell,recurrent_layers", ARCHITECTURES)
+def test_int8_stack_matches_int8_models_and_stays_close_to_keras(cell, recurrent_layers):
+    models = [_keras_model(cell, recurrent_layers, units=8, seed=seed) for seed in (3, 4)]
+    X = _inputs()
+    int8_models = [_bundle_model(model, int8=True) for model in models]
+    per_model = np.stack([model.predict(X) for model in int8_models])
+
+    stacked = stack_models(int8_models).predict(np.broadcast_to(X, (len(models),) + X.shape))
+    np.testing.assert_allclose(stacked, per_model, atol=1e-5)
+
+    expected = np.stack([model.predict(X, verbose=0) for model in models])
+    # Per-channel int8 kernels: a small fraction of the output range
+    assert np.abs(per_model - expected).max() < 0.02 * np.abs(expected).max()
+
+
+def test_converter_entry_point(tmp_path):
+    company_dir = tmp_path / "TEST"
+    company_dir.mkdir()
+    base_filename = "TEST_model_20240102_000000"
+    _keras_model('gru', 1, units=8, seed=5).save(company_dir / f"{base_filename}.keras")
+    scaler = StandardScaler().fit(np.arange(50, dtype=np.float64).reshape(-1, 1))
+    with open(company_dir / f"{base_filename}_scaler.pkl", 'wb') as f:
+        pickle.dump(scaler, f)
+    (company_dir / f"{base_filename}_metadata.json").write_text(json.dumps({'slicing_window': SLICING_WINDOW}))
+
+    # Run the way the README does, from stock-prediction-api/ with nothing on PYTHONPATH
+    env = {key: value for key, value in os.environ.items() if key != 'PYTHONPATH'}
+    env['MODEL_STORAGE_DIR'] = str(tmp_path)
+    result = subprocess.run(
+        [sys.executable, os.path.join("app", "model_ops", "model_bundle.py"), "TEST", "--remove-legacy"],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True, timeout=300
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert f"Converted TEST/{base_filename}" in result.stdout
+    assert sorted(os.listdir(company_dir)) == [f"{base_filename}{BUNDLE_EXTENSION}"]
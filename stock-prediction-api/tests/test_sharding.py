@@ -0,0 +1,76 @@
+"""
+Consistent-hash ring ownership and loop-free routing between shard nodes.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import endpoints
+from serving.sharding import HashRing, FORWARDED_HEADER, FORWARDED_PARAM
+
+COMPANIES = [f"C{i:04d}" for i in range(2000)]
+NODES = [f"node{i}" for i in range(4)]
+
+
+def _owners(ring):
+    return {company: ring.owner(company) for company in COMPANIES}
+
+
+def test_adding_a_node_only_moves_companies_to_it():
+    before = _owners(HashRing(NODES))
+    after = _owners(HashRing(NODES + ['node4']))
+
+    moved = [company for company in COMPANIES if before[company] != after[company]]
+    assert all(after[company] == 'node4' for company in moved)
+    # About 1/N of the companies move to the new node
+    assert 0.1 < len(moved) / len(COMPANIES) < 0.3
+
+
+def test_removing_a_node_only_moves_its_companies():
+    before = _owners(HashRing(NODES))
+    after = _owners(HashRing([node for node in NODES if node != 'node2']))
+
+    moved = [company for company in COMPANIES if before[company] != after[company]]
+    assert moved == [company for company in COMPANIES if before[company] == 'node2']
+    assert 'node2' not in after.values()
+
+
+def test_ownership_ignores_node_order_and_ticker_case():
+    ring = HashRing(NODES)
+    assert _owners(ring) == _owners(HashRing(list(reversed(NODES))))
+    assert ring.owner('msft') == ring.owner('MSFT')
+    assert HashRing([]).owner('MSFT') is None
+
+
+class _DisagreeingMembership:
+    """A node whose ring says every company belongs to another node"""
+    node_url = "http://node-a:8000"
+    forward_timeout = 1.0
+
+    def owner_url(self, company):
+        return "http://node-b:8000"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv('MODEL_STORAGE_DIR', str(tmp_path))
+    monkeypatch.setattr(endpoints, 'get_membership', lambda: _DisagreeingMembership())
+    monkeypatch.setattr(endpoints, 'get_shard_mode', lambda: 'redirect')
+    monkeypatch.setattr(endpoints, 'lookup_forecast', lambda company, days_ahead: None)
+    app = FastAPI()
+    app.include_router(endpoints.router, prefix="/api")
+    return TestClient(app)
+
+
+def test_redirect_is_followed_at_most_once(client):
+    payload = {'company': 'MSFT', 'days_ahead': 1}
+    response = client.post("/api/predict", json=payload, follow_redirects=False)
+    assert response.status_code == 307
+    assert response.headers['location'] == f"http://node-b:8000/api/predict?{FORWARDED_PARAM}=1"
+
+    # The other node disagrees too, but serves the redirected request itself (no model here: 404)
+    response = client.post(f"/api/predict?{FORWARDED_PARAM}=1", json=payload, follow_redirects=False)
+    assert response.status_code == 404
+    response = client.post("/api/predict", json=payload, headers={FORWARDED_HEADER: '1'},
+                           follow_redirects=False)
+    assert response.status_code == 404
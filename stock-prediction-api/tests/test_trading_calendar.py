@@ -0,0 +1,88 @@
+"""
+NYSE holiday rules and session boundaries of the trading calendar.
+"""
+from datetime import date, datetime, timezone
+import pytest
+
+from data_pipeline.trading_calendar import (
+    EXCHANGE_TIMEZONE, exchange_holidays, is_trading_day, last_completed_session, next_session_close,
+    window_for_bars
+)
+
+# Full-day NYSE closures as published by the exchange
+NYSE_HOLIDAYS = {
+    2020: ['2020-01-01', '2020-01-20', '2020-02-17', '2020-04-10', '2020-05-25', '2020-07-03',
+           '2020-09-07', '2020-11-26', '2020-12-25'],
+    # Christmas on a Saturday is observed on Friday the 24th
+    2021: ['2021-01-01', '2021-01-18', '2021-02-15', '2021-04-02', '2021-05-31', '2021-07-05',
+           '2021-09-06', '2021-11-25', '2021-12-24'],
+    # New Year's Day on a Saturday is not observed; Juneteenth starts (observed on Monday)
+    2022: ['2022-01-17', '2022-02-21', '2022-04-15', '2022-05-30', '2022-06-20', '2022-07-04',
+           '2022-09-05', '2022-11-24', '2022-12-26'],
+    2023: ['2023-01-02', '2023-01-16', '2023-02-20', '2023-04-07', '2023-05-29', '2023-06-19',
+           '2023-07-04', '2023-09-04', '2023-11-23', '2023-12-25'],
+    2024: ['2024-01-01', '2024-01-15', '2024-02-19', '2024-03-29', '2024-05-27', '2024-06-19',
+           '2024-07-04', '2024-09-02', '2024-11-28', '2024-12-25'],
+    # 2025-01-09: national day of mourning for President Carter
+    2025: ['2025-01-01', '2025-01-09', '2025-01-20', '2025-02-17', '2025-04-18', '2025-05-26',
+           '2025-06-19', '2025-07-04', '2025-09-01', '2025-11-27', '2025-12-25'],
+    2026: ['2026-01-01', '2026-01-19', '2026-02-16', '2026-04-03', '2026-05-25', '2026-06-19',
+           '2026-07-03', '2026-09-07', '2026-11-26', '2026-12-25'],
+}
+
+
+@pytest.mark.parametrize("year,holidays", NYSE_HOLIDAYS.items())
+def test_exchange_holidays(year, holidays):
+    assert exchange_holidays(year) == {date.fromisoformat(day) for day in holidays}
+    assert not any(is_trading_day(day) for day in holidays)
+
+
+@pytest.mark.parametrize("day,trading", [
+    ('2021-06-18', True),    # Juneteenth only closes the exchange from 2022
+    ('2021-12-31', True),    # New Year's Day 2022 fell on a Saturday
+    ('2026-07-02', True),
+    ('2024-07-06', False),   # Saturday
+    ('2024-07-07', False),   # Sunday
+])
+def test_is_trading_day(day, trading):
+    assert is_trading_day(day) == trading
+
+
+def _exchange_time(value):
+    return datetime.fromisoformat(value).replace(tzinfo=EXCHANGE_TIMEZONE)
+
+
+@pytest.mark.parametrize("now,expected", [
+    # The day's bar is final from 16:00 exchange time
+    (_exchange_time('2024-07-03 15:59:59'), '2024-07-02'),
+    (_exchange_time('2024-07-03 16:00:00'), '2024-07-03'),
+    # Monday before the close: Friday's bar
+    (_exchange_time('2024-01-08 15:59:00'), '2024-01-05'),
+    (_exchange_time('2024-01-08 16:01:00'), '2024-01-08'),
+    # Holidays and weekends, even after 16:00
+    (_exchange_time('2024-07-04 17:00:00'), '2024-07-03'),
+    (_exchange_time('2024-07-05 09:30:00'), '2024-07-03'),
+    (_exchange_time('2024-07-06 18:00:00'), '2024-07-05'),
+    # Aware times in other zones are converted (EST in January, EDT in July)
+    (datetime(2024, 1, 8, 20, 59, tzinfo=timezone.utc), '2024-01-05'),
+    (datetime(2024, 1, 8, 21, 0, tzinfo=timezone.utc), '2024-01-08'),
+    (datetime(2024, 7, 3, 19, 59, tzinfo=timezone.utc), '2024-07-02'),
+    (datetime(2024, 7, 3, 20, 0, tzinfo=timezone.utc), '2024-07-03'),
+])
+def test_last_completed_session(now, expected):
+    assert last_completed_session(now) == date.fromisoformat(expected)
+
+
+@pytest.mark.parametrize("now,expected", [
+    (_exchange_time('2024-07-03 15:59:59'), '2024-07-03'),
+    (_exchange_time('2024-07-03 16:00:00'), '2024-07-05'),
+    (_exchange_time('2024-12-24 16:30:00'), '2024-12-26'),
+    (_exchange_time('2026-07-02 16:00:00'), '2026-07-06'),
+])
+def test_next_session_close(now, expected):
+    assert next_session_close(now) == _exchange_time(f"{expected} 16:00:00")
+
+
+def test_window_for_bars_skips_holidays_and_weekends():
+    assert window_for_bars(3, end='2024-07-08') == (date(2024, 7, 3), date(2024, 7, 8))
+    assert window_for_bars(1, end='2024-07-04') == (date(2024, 7, 3), date(2024, 7, 3))